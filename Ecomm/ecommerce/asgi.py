@@ -3,14 +3,44 @@ ASGI config for ecommerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The storefront's read-heavy views and cart actions are async (store.views), so
+under ASGI one worker process serves many concurrent connections; a request
+waiting on the database or on a slow client no longer holds the worker.
+Serve it with an ASGI server, e.g.:
+
+    pip install "uvicorn[standard]" gunicorn
+    gunicorn ecommerce.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+Keep CONN_MAX_AGE at 0 under ASGI: the async ORM runs queries on a thread per
+request, so persistent connections would pile up instead of being reused.
+
+To compare against the WSGI path, start each server in turn on the same port
+(the WSGI one with ``gunicorn ecommerce.wsgi:application -w 4``) and run:
+
+    python manage.py bench_server http://127.0.0.1:8000/ -n 2000 -c 200 --slow 0.5
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import threading
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_asgi_application()
+
+# Compile templates, build the URL resolvers, fill caches and open database
+# connections before the first request rather than during it (WARMUP=1)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from store.warmup import warmup
+
+    # uvicorn imports this module inside its running event loop, where Django
+    # refuses synchronous database access: warm up on a thread and wait for it
+    thread = threading.Thread(target=warmup, name="warmup")
+    thread.start()
+    thread.join()
@@ -10,8 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# Load environment variables (database, cache, API keys) from .env
+load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,12 +43,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'store', 
     'accounts',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'store.middleware.ServerTimingMiddleware',
+    'store.middleware.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +64,9 @@ ROOT_URLCONF = 'ecommerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the Server-Timing header (store.middleware)
+        'BACKEND': 'store.templating.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / "templates"], 
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,7 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'store.context_processors.active_order',
+                'store.context_processors.cart_count',
             ],
         },
     },
@@ -75,17 +86,55 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from the environment; the defaults are the local development database.
+# DB_ENGINE=sqlite3 runs on local files instead (NAME defaults to db.sqlite3).
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'eccomdb',      # your PostgreSQL database name
-        'USER': 'postgres',     # your PostgreSQL username
-        'PASSWORD': 'admin',  # your PostgreSQL password
-        'HOST': 'localhost',    # or the server IP
-        'PORT': '5432',         # default PostgreSQL port
+        'ENGINE': f'django.db.backends.{DB_ENGINE}',
+        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3' if DB_ENGINE == 'sqlite3' else 'eccomdb'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', 'admin'),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        # Persistent connections for WSGI workers; leave at 0 under ASGI and use the pool
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Connection pooling (PostgreSQL with psycopg 3: pip install "psycopg[pool]")
+if os.getenv('DB_POOL_MAX_SIZE'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE')),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Read replicas: comma-separated hosts (PostgreSQL) or file names (SQLite), e.g.
+#   DB_REPLICAS=replica1.internal,replica2.internal
+#   DB_ENGINE=sqlite3 DB_REPLICAS=db-replica.sqlite3   (two local SQLite databases;
+#       migrate both with --database, or copy db.sqlite3 to stand in for replication)
+# Catalog and reporting reads go to a replica, see store/routers.py.
+DATABASE_REPLICAS = []
+for i, location in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == 'sqlite3':
+        replica['NAME'] = BASE_DIR / location.strip()
+    else:
+        host, _, port = location.strip().partition(':')
+        replica.update(HOST=host, PORT=port or replica['PORT'])
+    DATABASES[f'replica_{i}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{i}')
+
+DATABASE_ROUTERS = ['store.routers.PrimaryReplicaRouter']
+
+# After a write, the user's reads stay on the primary this long (replica lag headroom)
+DATABASE_STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -134,12 +183,64 @@ LOGOUT_REDIRECT_URL = '/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-import os
-from dotenv import load_dotenv
-# Load environment variables
-load_dotenv()
-
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 STATIC_URL = '/static/'
-STATICFILES_DIRS = [BASE_DIR / "static"]
\ No newline at end of file
+STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# collectstatic writes content-hashed names plus .gz/.br variants (store/staticfiles.py);
+# with DEBUG off they're served with far-future caching by store.staticfiles.serve_static
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'store.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Stylesheets trimmed to the selectors our templates use at collectstatic time
+STATIC_PURGE_CSS = ['css/bootstrap.min.css']
+# Extra class names to keep, e.g. ones only added from JavaScript
+STATIC_PURGE_SAFELIST = []
+
+# Cache (catalog fragments, see store/catalog.py)
+# Set REDIS_URL in production so every worker shares the catalog version;
+# the local-memory default is per process.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sessions (and anonymous visitors' carts, see store/cart.py) live in the database by
+# default. SESSION_BACKEND=cached_db reads them from the cache (set REDIS_URL) and writes
+# through; SESSION_BACKEND=signed_cookies keeps them in the browser, with no rows at all.
+SESSION_ENGINE = f"django.contrib.sessions.backends.{os.getenv('SESSION_BACKEND', 'db')}"
+
+# Worker warm-up (store/warmup.py): WARMUP=1 runs it in each worker at start-up, from
+# ecommerce/wsgi.py and ecommerce/asgi.py; `manage.py warmup` runs it and reports timings.
+# The pages are requested once, anonymously, to fill the catalog caches. It must run per
+# worker: don't combine WARMUP=1 with `gunicorn --preload`, which would warm only the
+# master before forking (its connections are closed when warm-up ends, never shared).
+WARMUP_ON_START = bool(os.getenv('WARMUP'))
+WARMUP_URLS = ['home', 'product_list', 'cart']
+
+# Server-Timing instrumentation (store.middleware): slow-request budgets in ms per URL name
+SERVER_TIMING_BUDGETS = {
+    'home': 200,
+    'product_list': 150,
+    'cart': 150,
+    'checkout': 300,
+    'manage_orders': 300,
+    'dashboard': 500,
+}
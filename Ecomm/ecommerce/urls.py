@@ -15,10 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include  
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from store.staticfiles import serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
      path('', include('store.urls')), 
@@ -26,4 +28,8 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # Collected, precompressed assets (run collectstatic first); a CDN or the
+    # web server can take over by serving STATIC_ROOT directly
+    urlpatterns += [re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.+)$', serve_static, name='static')]
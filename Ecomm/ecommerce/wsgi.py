@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_wsgi_application()
+
+# Compile templates, build the URL resolvers, fill caches and open database
+# connections before the first request rather than during it (WARMUP=1)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from store.warmup import warmup
+
+    warmup()
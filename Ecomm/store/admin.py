@@ -1,18 +1,306 @@
-from django.contrib import admin
+# store/admin.py
+import json
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Greatest, Round
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from .models import Product
+from django.utils.timezone import now
+
+from .cart import refresh_order_totals
+from .catalog import bump_catalog_version
+from .models import (
+    Category, Checkpoint, CoPurchase, DailySales, Order, OrderItem, Product, ProductImage, RelatedProduct,
+)
+from .search import match_products
+
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough to run
+EXACT_COUNT_THRESHOLD = 10_000
+THUMBNAIL_SIZE = 60
+
+
+# ------------------------------
+# SHARED
+# ------------------------------
+def estimated_count(queryset):
+    """
+    PostgreSQL's planner estimate of how many rows `queryset` returns (from
+    table statistics, so it may be off by a few percent), or None on other
+    databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Changelist paginator that skips COUNT(*) over large tables, see `estimated_count`."""
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class StoreModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Filtered changelists would otherwise also count the whole table
+    show_full_result_count = False
+    list_per_page = 50
+    # When set, the search box takes an id and filters this (indexed) field by it,
+    # instead of the default icontains scan over search_fields
+    search_id_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (self.search_id_field and search_term):
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip().lstrip("#")
+        if not term.isdigit():
+            return queryset.none(), False
+        return queryset.filter(**{self.search_id_field: int(term)}), False
+
+
+class ReadOnlyAdmin(StoreModelAdmin):
+    """Tables rebuilt by management commands: viewable, never edited by hand."""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+def _thumbnail(derivatives, fallback=None, width="jpeg"):
+    """<img> for the smallest stored derivative, never the (multi-megabyte) original."""
+    widths = (derivatives or {}).get(width) or {}
+    if widths:
+        url = default_storage.url(widths[min(widths, key=int)])
+    elif fallback:
+        url = fallback
+    else:
+        return "-"
+    return format_html(
+        '<img src="{}" width="{}" height="{}" style="object-fit: cover;" loading="lazy" alt="">',
+        url, THUMBNAIL_SIZE, THUMBNAIL_SIZE,
+    )
+
+
+# ------------------------------
+# CATALOG
+# ------------------------------
+class ProductActionForm(ActionForm):
+    amount = forms.DecimalField(required=False, max_digits=10, decimal_places=2,
+                                help_text="Price, percentage or stock quantity for the action.")
+
+
+class ProductImageInline(admin.TabularInline):
+    model = ProductImage
+    fields = ("image", "alt", "thumbnail")
+    readonly_fields = ("thumbnail",)
+    extra = 0
+
+    @admin.display(description="Preview")
+    def thumbnail(self, obj):
+        return _thumbnail(obj.image_derivatives)
+
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock', 'image_preview')  # Show the preview in list
-    readonly_fields = ('image_preview',)  # Make preview read-only in the form
+class ProductAdmin(StoreModelAdmin):
+    list_display = ("name", "category", "price", "stock", "updated_at", "thumbnail")
+    list_select_related = ("category",)
+    list_filter = ("category",)
+    # Shown in the search box hint; the search itself is get_search_results
+    search_fields = ("name", "description")
+    ordering = ("-id",)
+    readonly_fields = ("image_preview", "updated_at")
+    inlines = (ProductImageInline,)
+    action_form = ProductActionForm
+    actions = ("set_price", "change_price_by_percent", "set_stock", "add_stock")
+
+    def get_search_results(self, request, queryset, search_term):
+        # Same matching as the storefront: GIN/trigram indexes on PostgreSQL
+        if not search_term:
+            return queryset, False
+        return match_products(queryset, search_term), False
 
+    @admin.display(description="Image")
+    def thumbnail(self, obj):
+        return _thumbnail(obj.image_derivatives, obj.get_or_fetch_image() if not obj.image else None)
+
+    @admin.display(description="Image Preview")
     def image_preview(self, obj):
-        if obj.image:
-            return format_html(
-                '<img src="{}" style="max-width: 150px; max-height: 150px; object-fit: contain;" />',
-                obj.image.url
-            )
-        return "No Image"
-
-    image_preview.short_description = 'Image Preview'
+        # The 320px derivative is plenty for the form
+        widths = (obj.image_derivatives or {}).get("jpeg") or {}
+        if "320" in widths:
+            return format_html('<img src="{}" style="max-width: 320px;" alt="">', default_storage.url(widths["320"]))
+        return _thumbnail(obj.image_derivatives, obj.get_or_fetch_image() if not obj.image else None)
+
+    # Bulk actions: one UPDATE for the whole selection (or every filtered row
+    # with "select all"), instead of loading and saving each product
+    def _amount(self, request):
+        form = self.action_form(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        if form.is_valid() and form.cleaned_data["amount"] is not None:
+            return form.cleaned_data["amount"]
+        self.message_user(request, "Enter an amount for this action.", messages.ERROR)
+        return None
+
+    def _bulk_update(self, request, queryset, **values):
+        updated = queryset.order_by().update(updated_at=now(), **values)
+        # update() skips the post_save signal, so invalidate cached catalog pages here
+        bump_catalog_version()
+        self.message_user(request, f"Updated {updated} product(s).", messages.SUCCESS)
+
+    @admin.action(description="Set price to amount")
+    def set_price(self, request, queryset):
+        amount = self._amount(request)
+        if amount is not None:
+            if amount < 0:
+                return self.message_user(request, "Prices can't be negative.", messages.ERROR)
+            self._bulk_update(request, queryset, price=amount)
+
+    @admin.action(description="Change price by amount percent")
+    def change_price_by_percent(self, request, queryset):
+        amount = self._amount(request)
+        if amount is not None:
+            factor = 1 + amount / 100
+            if factor < 0:
+                return self.message_user(request, "Prices can't be negative.", messages.ERROR)
+            self._bulk_update(request, queryset, price=Round(F("price") * factor, 2))
+
+    @admin.action(description="Set stock to amount")
+    def set_stock(self, request, queryset):
+        amount = self._amount(request)
+        if amount is not None:
+            self._bulk_update(request, queryset, stock=max(0, int(amount)))
+
+    @admin.action(description="Add amount to stock (negative to remove)")
+    def add_stock(self, request, queryset):
+        amount = self._amount(request)
+        if amount is not None:
+            self._bulk_update(request, queryset, stock=Greatest(F("stock") + int(amount), 0))
+
+
+@admin.register(Category)
+class CategoryAdmin(StoreModelAdmin):
+    list_display = ("name", "slug", "updated_at")
+    search_fields = ("name",)
+    prepopulated_fields = {"slug": ("name",)}
+    ordering = ("name",)
+
+
+@admin.register(ProductImage)
+class ProductImageAdmin(StoreModelAdmin):
+    list_display = ("id", "product", "alt", "thumbnail")
+    list_select_related = ("product",)
+    raw_id_fields = ("product",)
+    search_fields = ("=product__id",)
+    search_id_field = "product_id"
+    ordering = ("-id",)
+
+    @admin.display(description="Preview")
+    def thumbnail(self, obj):
+        return _thumbnail(obj.image_derivatives)
+
+
+# ------------------------------
+# ORDERS
+# ------------------------------
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    fields = ("product", "quantity", "price")
+    raw_id_fields = ("product",)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product")
+
+
+@admin.register(Order)
+class OrderAdmin(StoreModelAdmin):
+    list_display = ("id", "user", "paid", "total_amount", "item_count", "created_at", "paid_at")
+    list_select_related = ("user",)
+    list_filter = ("paid",)
+    # Order number or exact username
+    search_fields = ("=id", "=user__username")
+    raw_id_fields = ("user",)
+    # Maintained from the lines (store.cart.refresh_order_totals)
+    readonly_fields = ("total_amount", "item_count", "created_at", "updated_at")
+    ordering = ("-created_at", "-id")
+    inlines = (OrderItemInline,)
+
+    search_id_field = "pk"
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and not search_term.strip().lstrip("#").isdigit():
+            return queryset.filter(user__username=search_term.strip()), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if any(formset.has_changed() for formset in formsets):
+            refresh_order_totals(Order.objects.filter(pk=form.instance.pk))
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(ReadOnlyAdmin):
+    """Lines are edited on their order, which keeps its totals in step."""
+    list_display = ("id", "order", "product", "quantity", "price", "updated_at")
+    list_select_related = ("order__user", "product")
+    search_fields = ("=order__id",)
+    search_id_field = "order_id"
+    ordering = ("-id",)
+
+
+# ------------------------------
+# REPORTING AND JOBS
+# ------------------------------
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyAdmin):
+    list_display = ("date", "category", "revenue", "orders", "units")
+    list_select_related = ("category",)
+    list_filter = ("category",)
+    ordering = ("-date",)
+
+
+@admin.register(CoPurchase)
+class CoPurchaseAdmin(ReadOnlyAdmin):
+    list_display = ("product", "other", "orders")
+    list_select_related = ("product", "other")
+    search_fields = ("=product__id",)
+    search_id_field = "product_id"
+    ordering = ("-id",)
+
+
+@admin.register(RelatedProduct)
+class RelatedProductAdmin(ReadOnlyAdmin):
+    list_display = ("product", "rank", "related", "score")
+    list_select_related = ("product", "related")
+    search_fields = ("=product__id",)
+    search_id_field = "product_id"
+    ordering = ("product", "rank")
+
+
+@admin.register(Checkpoint)
+class CheckpointAdmin(StoreModelAdmin):
+    """Deleting a checkpoint makes its job start over from scratch on the next run."""
+    list_display = ("name", "timestamp")
+    ordering = ("name",)
@@ -0,0 +1,260 @@
+# store/cart.py
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils.timezone import now
+
+from .models import Order, OrderItem, Product
+
+# Session key holding the navbar badge count (number of lines in the active order)
+CART_COUNT_SESSION_KEY = "cart_count"
+# Session key holding an anonymous visitor's cart, {str(product_id): quantity}
+CART_SESSION_KEY = "cart"
+# Most units of one product a cart line holds; keeps posted and merged quantities
+# (and the sums of repeated adds) well inside the quantity column
+MAX_LINE_QUANTITY = 999
+
+
+def get_cart_count(request):
+    """
+    Return the number of lines in the user's active order, cached in the session.
+    Only queries the database when the cached value has been invalidated.
+    Anonymous visitors get the number of lines in their session cart.
+    """
+    if not request.user.is_authenticated:
+        return len(request.session.get(CART_SESSION_KEY, {}))
+
+    count = request.session.get(CART_COUNT_SESSION_KEY)
+    if count is None:
+        count = OrderItem.objects.filter(order__user=request.user, order__paid=False).count()
+        request.session[CART_COUNT_SESSION_KEY] = count
+    return count
+
+
+def set_cart_count(request, count):
+    """Store a count the caller already knows (e.g. from a loaded cart), writing only on change."""
+    if request.session.get(CART_COUNT_SESSION_KEY) != count:
+        request.session[CART_COUNT_SESSION_KEY] = count
+
+
+def invalidate_cart_count(request):
+    """Drop the cached count; call after any change to the user's active order."""
+    request.session.pop(CART_COUNT_SESSION_KEY, None)
+
+
+async def aget_cart_count(request):
+    """Async version of `get_cart_count`."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return len(await request.session.aget(CART_SESSION_KEY, {}))
+
+    count = await request.session.aget(CART_COUNT_SESSION_KEY)
+    if count is None:
+        count = await OrderItem.objects.filter(order__user=user, order__paid=False).acount()
+        await request.session.aset(CART_COUNT_SESSION_KEY, count)
+    return count
+
+
+async def aset_cart_count(request, count):
+    """Async version of `set_cart_count`."""
+    if await request.session.aget(CART_COUNT_SESSION_KEY) != count:
+        await request.session.aset(CART_COUNT_SESSION_KEY, count)
+
+
+async def ainvalidate_cart_count(request):
+    """Async version of `invalidate_cart_count`."""
+    await request.session.apop(CART_COUNT_SESSION_KEY, None)
+
+
+def _order_totals():
+    lines = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    money = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        "total_amount": Coalesce(
+            Subquery(lines.annotate(total=Sum(F("price") * F("quantity"), output_field=money)).values("total")),
+            Value(0), output_field=money,
+        ),
+        "item_count": Coalesce(Subquery(lines.annotate(units=Sum("quantity")).values("units")), Value(0)),
+        "updated_at": now(),
+    }
+
+
+def refresh_order_totals(orders):
+    """
+    Recompute `total_amount` and `item_count` of `orders` (a queryset) from their
+    lines in one UPDATE. Call after any change to an unpaid order's lines.
+    """
+    return orders.update(**_order_totals())
+
+
+def add_lines_to_order(order, quantities):
+    """
+    Add `{product_id: quantity}` to an order in one statement: insert each line
+    at the product's current price, or add to the existing line's quantity.
+    Relies on the (order, product) unique constraint, so concurrent clicks
+    can't lose increments. Line quantities are capped at MAX_LINE_QUANTITY.
+    Products that don't exist are skipped, and nothing is written once the
+    order is paid; returns the number of lines written. The order's totals
+    are refreshed after.
+    """
+    if not quantities:
+        return 0
+    connection = connections[router.db_for_write(OrderItem)]
+    qn = connection.ops.quote_name
+    item_table = qn(OrderItem._meta.db_table)
+    order_table = qn(Order._meta.db_table)
+    order_col = qn(OrderItem._meta.get_field("order").column)
+    product_col = qn(OrderItem._meta.get_field("product").column)
+    updated_col = qn("updated_at")
+    when = " ".join(["WHEN %s THEN %s"] * len(quantities))
+    placeholders = ", ".join(["%s"] * len(quantities))
+    added = f"{item_table}.{qn('quantity')} + excluded.{qn('quantity')}"
+
+    # On PostgreSQL, share-lock the order: an add racing checkout waits for it
+    # to commit, then sees the order paid and writes nothing (SQLite serializes writes)
+    lock = " FOR SHARE OF o" if connection.vendor == "postgresql" else ""
+
+    # INSERT ... SELECT ... ON CONFLICT works on PostgreSQL and SQLite 3.24+
+    sql = (
+        f"INSERT INTO {item_table} ({order_col}, {product_col}, {qn('price')}, {qn('quantity')}, {updated_col}) "
+        f"SELECT o.{qn('id')}, p.{qn('id')}, p.{qn('price')}, CASE p.{qn('id')} {when} END, %s "
+        f"FROM {qn(Product._meta.db_table)} p INNER JOIN {order_table} o ON o.{qn('id')} = %s "
+        f"WHERE o.{qn('paid')} = %s AND p.{qn('id')} IN ({placeholders}){lock} "
+        f"ON CONFLICT ({order_col}, {product_col}) "
+        f"DO UPDATE SET {qn('quantity')} = CASE WHEN {added} > %s THEN %s ELSE {added} END, "
+        f"{updated_col} = excluded.{updated_col}"
+    )
+    updated_at = connection.ops.adapt_datetimefield_value(now())
+    params = [
+        *[value for pk, quantity in quantities.items() for value in (pk, min(quantity, MAX_LINE_QUANTITY))],
+        updated_at, order.pk, False, *quantities, MAX_LINE_QUANTITY, MAX_LINE_QUANTITY,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        written = cursor.rowcount
+    if written:
+        refresh_order_totals(Order.objects.filter(pk=order.pk, paid=False))
+    return written
+
+
+def add_to_order(order, product_id, quantity):
+    """Add one product to an order (see `add_lines_to_order`). False if it doesn't exist."""
+    return add_lines_to_order(order, {product_id: quantity}) > 0
+
+
+def add_to_user_cart(user, quantities):
+    """
+    Add `{product_id: quantity}` to the user's active order, creating it if
+    needed; returns the number of lines written. If checkout paid the order
+    between the lookup and the upsert, the lines go to a new cart instead.
+    """
+    for _ in range(2):
+        # The one-unpaid-order constraint makes concurrent creates fall back to the winner's row
+        order, _ = Order.objects.get_or_create(user=user, paid=False)
+        written = add_lines_to_order(order, quantities)
+        if written or not Order.objects.filter(pk=order.pk, paid=True).exists():
+            break
+    return written
+
+
+# The upsert is raw SQL, which has no async ORM counterpart; run it in the ORM's thread
+aadd_to_user_cart = sync_to_async(add_to_user_cart)
+
+
+def change_cart_line(user, item_id, action):
+    """
+    Apply "increase", "decrease" (removing the line at 0) or "remove" to one of
+    the user's cart lines and refresh the totals, holding the cart's row lock
+    like checkout does: lines can't change while checkout takes stock for them,
+    and an action that waited for a checkout finds the cart paid and does
+    nothing. Returns whether a line changed.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(user=user, paid=False).first()
+        if order is None:
+            return False
+        # Single conditional UPDATE/DELETE statements, so concurrent clicks don't lose changes
+        items = OrderItem.objects.filter(id=item_id, order=order)
+        if action == "increase":
+            changed = items.update(quantity=Least(F("quantity") + 1, MAX_LINE_QUANTITY), updated_at=now())
+        elif action == "decrease":
+            changed = items.filter(quantity__gt=1).update(quantity=F("quantity") - 1, updated_at=now())
+            if not changed:
+                changed, _ = items.delete()
+        else:
+            changed, _ = items.delete()
+        if changed:
+            refresh_order_totals(Order.objects.filter(pk=order.pk))
+    return bool(changed)
+
+
+achange_cart_line = sync_to_async(change_cart_line)
+
+
+# ------------------------------
+# ANONYMOUS (SESSION) CARTS
+# ------------------------------
+class SessionCartLines(list):
+    def all(self):
+        return self
+
+
+class SessionCart:
+    """
+    An anonymous visitor's cart, shaped like an Order loaded by `load_cart` for
+    the cart template. Lines are unsaved OrderItems at the current price, with
+    the product id standing in for the line id.
+    """
+
+    def __init__(self, lines):
+        self.items = SessionCartLines(lines)
+
+    def total(self):
+        return sum(line.total_price() for line in self.items)
+
+
+async def aload_session_cart(request):
+    """The visitor's session cart with its products, dropping products that no longer exist."""
+    quantities = await request.session.aget(CART_SESSION_KEY, {})
+    products = await Product.objects.ain_bulk([int(pk) for pk in quantities])
+    if len(products) != len(quantities):
+        quantities = {pk: qty for pk, qty in quantities.items() if int(pk) in products}
+        await request.session.aset(CART_SESSION_KEY, quantities)
+    return SessionCart([
+        OrderItem(id=product.pk, product=product, price=product.price, quantity=quantities[str(product.pk)])
+        for product in sorted(products.values(), key=lambda product: product.pk)
+    ])
+
+
+async def aupdate_session_cart(request, product_id, change, create=False):
+    """
+    Apply `change(quantity) -> quantity` to one line of the session cart
+    (0 removes it). Returns the new quantities, or None if the line is missing
+    and not `create`.
+    """
+    quantities = dict(await request.session.aget(CART_SESSION_KEY, {}))
+    key = str(product_id)
+    if key not in quantities and not create:
+        return None
+    quantity = min(change(quantities.get(key, 0)), MAX_LINE_QUANTITY)
+    if quantity > 0:
+        quantities[key] = quantity
+    else:
+        quantities.pop(key, None)
+    await request.session.aset(CART_SESSION_KEY, quantities)
+    return quantities
+
+
+def merge_session_cart(request, user):
+    """
+    Move the session cart into the user's active order when they sign in, with
+    one upsert for all its lines. Abandoned anonymous carts never reach the database.
+    """
+    quantities = request.session.pop(CART_SESSION_KEY, None)
+    if not quantities:
+        return
+    add_to_user_cart(user, {
+        int(pk): min(quantity, MAX_LINE_QUANTITY) for pk, quantity in quantities.items() if quantity > 0
+    })
+    invalidate_cart_count(request)
@@ -0,0 +1,54 @@
+# store/catalog.py
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = "catalog:version"
+# Fragments also expire on their own, in case a bulk change skipped the version bump
+FRAGMENT_TIMEOUT = 60 * 15
+
+
+def catalog_version():
+    """Current catalog version; cached fragments from older versions are never read again."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter can't reuse old fragment keys
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog fragment. Call after any catalog change."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def fragment_key(name, params):
+    """Cache key for a catalog fragment rendered from the normalized query string `params`."""
+    digest = hashlib.md5(params.encode(), usedforsecurity=False).hexdigest()
+    return f"catalog:{catalog_version()}:{name}:{digest}"
+
+
+def cached_fragment(name, params, render):
+    """Return the cached fragment, calling `render()` and storing its output on a miss."""
+    key = fragment_key(name, params)
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+    return html
+
+
+async def acached_fragment(name, params, render):
+    """Async version of `cached_fragment`; `render` is a coroutine function."""
+    key = await sync_to_async(fragment_key)(name, params)
+    html = await cache.aget(key)
+    if html is None:
+        html = await render()
+        await cache.aset(key, html, FRAGMENT_TIMEOUT)
+    return html
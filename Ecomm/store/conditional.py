@@ -0,0 +1,42 @@
+# store/conditional.py
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def aconditional(signature):
+    """
+    Conditional GET for async views, like django.views.decorators.http.condition
+    but with an async `signature(request, *args, **kwargs)` returning
+    `(state, last_modified)`: any repr()-able summary of the data the page is
+    built from (hashed into the ETag) and a datetime or None. Both are computed
+    before the view runs, so an unchanged page costs one or two aggregate
+    queries and returns 304 without rendering.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+
+            state, last_modified = await signature(request, *args, **kwargs)
+            etag = quote_etag(hashlib.md5(repr(state).encode(), usedforsecurity=False).hexdigest())
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if timestamp is not None:
+                    response.headers.setdefault("Last-Modified", http_date(timestamp))
+                # Browsers may keep the page but must ask before reusing it
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return inner
+
+    return decorator
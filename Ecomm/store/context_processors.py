@@ -1,13 +1,25 @@
 # store/context_processors.py
-from .models import Order
+from django.utils.functional import SimpleLazyObject
 
-def active_order(request):
+from .cart import aget_cart_count, get_cart_count
+
+
+def cart_count(request):
     """
-    Adds the current user's active (unpaid) order to the template context.
+    Adds the cart badge count to the template context. It's lazy, so pages
+    that never show it never touch the database, and cached in the session.
+
+    Async views can't hit the database from a template, so they call
+    `aprepare_context` first.
     """
-    if request.user.is_authenticated:
-        order = Order.objects.filter(user=request.user, paid=False).first()
-    else:
-        order = None
+    return {'cart_count': SimpleLazyObject(lambda: get_cart_count(request))}
 
-    return {'active_order': order}
+
+async def aprepare_context(request):
+    """
+    Resolve, with async queries, what base.html reads through the context
+    processors: the user (replacing the lazy `request.user`) and the badge
+    count (cached in the session, where `get_cart_count` then finds it).
+    """
+    request.user = await request.auser()
+    await aget_cart_count(request)
@@ -0,0 +1,55 @@
+# store/exports.py
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+class _Echo:
+    """File-like object whose write() just returns the line, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, header, filename):
+    """
+    Stream row tuples as a CSV download without buffering it. `rows` is an
+    iterable, or under ASGI an async iterable (e.g. `aiterator()`): Django
+    collects a sync iterator into a list before sending it from an ASGI server.
+    """
+    writer = csv.writer(_Echo())
+
+    if hasattr(rows, "__aiter__"):
+        async def lines():
+            yield writer.writerow(header)
+            async for row in rows:
+                yield writer.writerow(row)
+    else:
+        def lines():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def stream_ndjson(rows, header, filename):
+    """Stream row tuples as newline-delimited JSON objects; `rows` as for `stream_csv`."""
+    def line(row):
+        return json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n"
+
+    if hasattr(rows, "__aiter__"):
+        async def lines():
+            async for row in rows:
+                yield line(row)
+    else:
+        def lines():
+            for row in rows:
+                yield line(row)
+
+    response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.ndjson"'
+    return response
@@ -0,0 +1,84 @@
+# store/facets.py
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+# (min, max) price buckets; max is exclusive, None means open-ended
+PRICE_BUCKETS = [
+    (Decimal("0"), Decimal("25")),
+    (Decimal("25"), Decimal("50")),
+    (Decimal("50"), Decimal("100")),
+    (Decimal("100"), Decimal("250")),
+    (Decimal("250"), Decimal("500")),
+    (Decimal("500"), None),
+]
+CENT = Decimal("0.01")
+
+
+def _bucket_q(low, high):
+    q = Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def _facet_rows(base, min_price, max_price):
+    price_q = Q()
+    if min_price:
+        price_q &= Q(price__gte=min_price)
+    if max_price:
+        price_q &= Q(price__lte=max_price)
+
+    aggregates = {"count": Count("id", filter=price_q) if price_q else Count("id")}
+    for i, (low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f"bucket_{i}"] = Count("id", filter=_bucket_q(low, high))
+
+    # One GROUP BY over the matching products; bucket totals are summed in _summarize
+    return base.order_by().values("category__id", "category__name").annotate(**aggregates)
+
+
+def product_facets(base, selected_categories, min_price="", max_price=""):
+    """
+    Category and price-bucket counts for the storefront sidebar, in one query.
+
+    `base` is the product queryset with every filter applied except category
+    and price. Each facet respects the other facet's selection: category
+    counts honour the price range, bucket counts honour the selected categories.
+    """
+    rows = _facet_rows(base, min_price, max_price)
+    return _summarize(rows, selected_categories, min_price, max_price)
+
+
+async def aproduct_facets(base, selected_categories, min_price="", max_price=""):
+    """Async version of `product_facets`."""
+    rows = [row async for row in _facet_rows(base, min_price, max_price)]
+    return _summarize(rows, selected_categories, min_price, max_price)
+
+
+def _summarize(rows, selected_categories, min_price, max_price):
+    selected = {int(c) for c in selected_categories}
+    categories = []
+    bucket_counts = [0] * len(PRICE_BUCKETS)
+    for row in rows:
+        category_id = row["category__id"]
+        if category_id is not None and (row["count"] or category_id in selected):
+            categories.append({"id": category_id, "name": row["category__name"], "count": row["count"]})
+        if not selected or category_id in selected:
+            for i in range(len(PRICE_BUCKETS)):
+                bucket_counts[i] += row[f"bucket_{i}"]
+
+    price_buckets = []
+    for (low, high), count in zip(PRICE_BUCKETS, bucket_counts):
+        # Buckets are applied through the inclusive min/max filters, so stop a cent short
+        bucket_min = str(low)
+        bucket_max = str(high - CENT) if high is not None else ""
+        price_buckets.append({
+            "min": bucket_min,
+            "max": bucket_max,
+            "label": f"${low}+" if high is None else f"${low} – ${high - CENT}",
+            "count": count,
+            "selected": (min_price, max_price) == (bucket_min, bucket_max),
+        })
+
+    categories.sort(key=lambda c: c["name"].lower())
+    return {"categories": categories, "price_buckets": price_buckets}
@@ -0,0 +1,127 @@
+# store/images.py
+import base64
+import hashlib
+import posixpath
+from io import BytesIO
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+# Card/listing widths in pixels; the originals are often 1-2 MB and 2000px+
+DERIVATIVE_WIDTHS = (160, 320, 640)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DERIVATIVE_DIR = "derivatives"
+# Width of the inline preview; the browser's upscaling does the rest of the blurring
+PLACEHOLDER_WIDTH = 16
+
+
+def _derivative_name(source_name, width, ext):
+    folder, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(folder, DERIVATIVE_DIR, f"{stem}-{width}.{ext}")
+
+
+def generate_derivatives(source_name, storage=default_storage):
+    """
+    Write resized WebP and JPEG copies of a stored image at DERIVATIVE_WIDTHS
+    (never upscaling) and return a description for the model's JSON field:
+    {"source": name, "webp": {"320": name, ...}, "jpeg": {...},
+    "placeholder": data URI, "color": "#rrggbb"}.
+    """
+    with storage.open(source_name, "rb") as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+
+    widths = [w for w in DERIVATIVE_WIDTHS if w < original.width] or [original.width]
+    derivatives = {"source": source_name, **placeholder(original)}
+    for ext, (image_format, options) in DERIVATIVE_FORMATS.items():
+        has_alpha = ext == "webp" and original.mode in ("RGBA", "LA", "P")
+        image = original.convert("RGBA" if has_alpha else "RGB")
+        derivatives[ext] = {}
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+
+            name = _derivative_name(source_name, width, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            derivatives[ext][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+    return derivatives
+
+
+def placeholder(image):
+    """
+    Low-quality stand-ins for `image`, small enough to inline in the page: a
+    blurred PLACEHOLDER_WIDTH-pixel JPEG as a data: URI (a few hundred bytes)
+    and the dominant colour, shown while the real image loads.
+    """
+    rgb = image.convert("RGB")
+    height = max(1, round(rgb.height * PLACEHOLDER_WIDTH / rgb.width))
+    tiny = rgb.resize((PLACEHOLDER_WIDTH, height), Image.BOX).filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    tiny.save(buffer, "JPEG", quality=60)
+
+    # Most common colour of a reduced palette, rather than the muddy average
+    palette = rgb.resize((64, 64), Image.BOX).quantize(colors=5)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return {
+        "placeholder": "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii"),
+        "color": f"#{red:02x}{green:02x}{blue:02x}",
+    }
+
+
+def fallback_image(text, width=400, height=300):
+    """
+    Stand-in for a product without a photo: an SVG data: URI with the initials
+    of `text` on a colour derived from its hash, so the same product always
+    gets the same picture and the browser has nothing to fetch.
+    """
+    hue = int.from_bytes(hashlib.md5(text.encode(), usedforsecurity=False).digest()[:2], "big") % 360
+    initials = "".join(word[0] for word in text.split()[:2]).upper() or "?"
+    svg = (
+        f"<svg xmlns='http://www.w3.org/2000/svg' width='{width}' height='{height}' viewBox='0 0 {width} {height}'>"
+        f"<rect width='100%' height='100%' fill='hsl({hue},45%,85%)'/>"
+        f"<text x='50%' y='50%' dy='.35em' text-anchor='middle' font-family='sans-serif' "
+        f"font-size='{height // 3}' fill='hsl({hue},35%,35%)'>{escape(initials)}</text></svg>"
+    )
+    return "data:image/svg+xml," + quote(svg, safe=" '=:/,.()")
+
+
+def refresh_derivatives(instance, field_name="image", force=False):
+    """
+    Regenerate derivatives for `instance.<field_name>` when the stored image
+    changed since they were last built, and save them with a single UPDATE.
+    """
+    image = getattr(instance, field_name)
+    current = instance.image_derivatives or {}
+    if not image:
+        new = {}
+    elif force or current.get("source") != image.name:
+        try:
+            new = generate_derivatives(image.name, image.storage)
+        except OSError:
+            # Missing or unreadable file: cards fall back to the original URL
+            new = {}
+    else:
+        return
+    if new != current:
+        instance.image_derivatives = new
+        type(instance).objects.using(instance._state.db).filter(pk=instance.pk).update(image_derivatives=new)
+
+
+def srcset(derivatives, ext, storage=default_storage):
+    """`srcset` attribute value for one format, or "" when there are no derivatives."""
+    widths = (derivatives or {}).get(ext) or {}
+    return ", ".join(
+        f"{storage.url(name)} {width}w"
+        for width, name in sorted(widths.items(), key=lambda item: int(item[0]))
+    )
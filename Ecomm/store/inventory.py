@@ -0,0 +1,48 @@
+# store/inventory.py
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils.timezone import now
+
+from .models import Product
+
+
+class OutOfStock(Exception):
+    """Raised inside a checkout transaction to roll back a partial stock decrement."""
+
+
+def _per_product(lines, value):
+    return Case(
+        *[When(pk=line.product_id, then=Value(value(line))) for line in lines],
+        output_field=IntegerField(),
+    )
+
+
+def decrement_stock(lines):
+    """
+    Take stock for every order line in one conditional UPDATE
+    (stock = stock - quantity WHERE stock >= quantity). Rows are locked only
+    for the statement, so hot SKUs don't serialize checkouts behind per-row
+    SELECT FOR UPDATE loops.
+
+    Returns True if every line was fulfilled. On False some rows may have
+    been decremented, so the caller must roll back its transaction.
+    """
+    if not lines:
+        return True
+    quantity = _per_product(lines, lambda line: line.quantity)
+    updated = Product.objects.filter(
+        pk__in=[line.product_id for line in lines],
+        stock__gte=quantity,
+    ).update(stock=F("stock") - quantity, updated_at=now())
+    return updated == len(lines)
+
+
+def stock_shortages(lines, refresh=False):
+    """
+    Lines asking for more than is in stock, as (line, available) pairs.
+    Uses the already-loaded products unless `refresh` re-reads current stock.
+    """
+    if refresh:
+        stock = dict(Product.objects.filter(pk__in=[l.product_id for l in lines]).values_list("pk", "stock"))
+    else:
+        stock = {line.product_id: line.product.stock for line in lines}
+    return [(line, stock.get(line.product_id, 0)) for line in lines if stock.get(line.product_id, 0) < line.quantity]
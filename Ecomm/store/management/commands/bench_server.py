@@ -0,0 +1,78 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def fetch(host, port, path, slow):
+    """One GET over a fresh connection; with `slow`, the client stalls mid-request like a bad mobile link."""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    head = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n".encode()
+    writer.write(head)
+    if slow:
+        await writer.drain()
+        await asyncio.sleep(slow)
+    writer.write(b"\r\n")
+    await writer.drain()
+    status = (await reader.readline()).split(b" ", 2)[1]
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(status), time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server with concurrent (optionally slow) clients and report "
+        "throughput and latency percentiles. Used to compare the WSGI and ASGI setups "
+        "described in ecommerce/asgi.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="e.g. http://127.0.0.1:8000/")
+        parser.add_argument("-n", "--requests", type=int, default=1000)
+        parser.add_argument("-c", "--concurrency", type=int, default=100)
+        parser.add_argument("--slow", type=float, default=0.0,
+                            help="Seconds each client stalls before finishing its request.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("Only plain http:// URLs are supported.")
+        path = url.path or "/"
+        if url.query:
+            path += f"?{url.query}"
+        target = (url.hostname, url.port or 80, path)
+
+        started = time.perf_counter()
+        results = asyncio.run(self.run(target, options["requests"], options["concurrency"], options["slow"]))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for status, latency in results if status < 500)
+        errors = len(results) - len(latencies)
+        if len(latencies) < 2:
+            raise CommandError(f"{errors} of {len(results)} requests failed.")
+        cuts = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{len(results)} requests, concurrency {options['concurrency']}, {errors} errors\n"
+            f"throughput  {len(results) / elapsed:.1f} req/s\n"
+            f"latency ms  p50 {cuts[49] * 1000:.0f}  p95 {cuts[94] * 1000:.0f}  "
+            f"p99 {cuts[98] * 1000:.0f}  max {latencies[-1] * 1000:.0f}"
+        )
+
+    async def run(self, target, total, concurrency, slow):
+        queue = iter(range(total))
+        results = []
+
+        async def client():
+            for _ in queue:
+                try:
+                    results.append(await fetch(*target, slow))
+                except (OSError, IndexError, ValueError):
+                    results.append((599, 0.0))
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.images import generate_derivatives
+from store.models import Product, ProductImage
+
+BATCH_SIZE = 200
+
+
+def _derive(name):
+    """Worker: build derivatives for one stored image; returns (name, result or None)."""
+    try:
+        return name, generate_derivatives(name)
+    except OSError:
+        return name, None
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG derivatives and placeholders for existing product images using all CPU cores."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild derivatives that already exist.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores).")
+
+    def handle(self, *args, **options):
+        # Children must open their own database connections
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=django.setup) as pool:
+            for model in (Product, ProductImage):
+                rows = model.objects.exclude(image="").exclude(image__isnull=True)
+                if not options["force"]:
+                    # Also picks up images built before placeholders were added
+                    rows = rows.exclude(image_derivatives__has_key="placeholder")
+                rows = rows.values_list("pk", "image").order_by("pk")
+
+                # Seek by pk so no cursor stays open while rows are updated
+                last_pk = 0
+                while batch := list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+                    ok, bad = self.process(pool, model, batch)
+                    done, failed = done + ok, failed + bad
+                    last_pk = batch[-1][0]
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {done} image(s), {failed} failed."))
+
+    def process(self, pool, model, batch):
+        pks_by_name = {}
+        for pk, name in batch:
+            pks_by_name.setdefault(name, []).append(pk)
+
+        ok = failed = 0
+        for name, derivatives in pool.map(_derive, pks_by_name, chunksize=4):
+            if derivatives is None:
+                failed += 1
+                self.stderr.write(f"Could not read {name}")
+                continue
+            model.objects.filter(pk__in=pks_by_name[name]).update(image_derivatives=derivatives)
+            ok += 1
+        return ok, failed
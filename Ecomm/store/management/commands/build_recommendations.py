@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils.timezone import now
+
+from store.models import PAYMENT_SETTLE_TIME, Checkpoint, CoPurchase, Order, OrderItem, RelatedProduct
+from store.recommendations import RELATED_PER_PRODUCT, count_copurchases, score_products
+
+CHECKPOINT_NAME = "build_recommendations"
+PRODUCTS_PER_BATCH = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold orders paid since the last run into the co-purchase counts, then rescore "
+        "the related products of every product in them. Products not in new orders keep "
+        "their lists until a --full rebuild. Orders paid in the last few minutes wait for "
+        "the next run, until their checkout has surely committed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recount every paid order, ignoring the last run.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Order ids per counting statement.")
+        parser.add_argument("--top", type=int, default=RELATED_PER_PRODUCT, help="Related products kept per product.")
+        parser.add_argument("--min-orders", type=int, default=2,
+                            help="Orders a pair must share to be recommended.")
+        parser.add_argument("--settle", type=int, default=int(PAYMENT_SETTLE_TIME.total_seconds()),
+                            help="Seconds a checkout may take to commit after stamping paid_at.")
+
+    def handle(self, *args, **options):
+        # Checkouts stamp paid_at before they commit, so one paid just before now may
+        # not be visible yet. Stop the window short of it: the half-open windows then
+        # count each order once, provided no checkout takes longer than --settle.
+        cutoff = now() - timedelta(seconds=options["settle"])
+        checkpoint = Checkpoint.objects.filter(name=CHECKPOINT_NAME).first()
+
+        orders = Order.objects.filter(paid=True, paid_at__isnull=False, paid_at__lt=cutoff)
+        if checkpoint and not options["full"]:
+            orders = orders.filter(paid_at__gte=checkpoint.timestamp)
+        bounds = orders.aggregate(low=Min("id"), high=Max("id"))
+
+        pairs = 0
+        with transaction.atomic():
+            if options["full"]:
+                CoPurchase.objects.all().delete()
+                RelatedProduct.objects.all().delete()
+            if bounds["low"] is not None:
+                # Id ranges bound the size of each self-join
+                for low in range(bounds["low"], bounds["high"] + 1, options["batch_size"]):
+                    pairs += count_copurchases(orders.filter(id__gte=low, id__lt=low + options["batch_size"]))
+            Checkpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={"timestamp": cutoff})
+
+        products = sorted(set(OrderItem.objects.filter(order__in=orders).values_list("product", flat=True)))
+        related = 0
+        for i in range(0, len(products), PRODUCTS_PER_BATCH):
+            related += score_products(products[i:i + PRODUCTS_PER_BATCH], options["top"], options["min_orders"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Counted {pairs} product pair(s); rescored {len(products)} product(s), {related} related row(s)."
+        ))
@@ -0,0 +1,177 @@
+import csv
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from store.catalog import bump_catalog_version
+from store.models import Category, Product
+from store.search import refresh_search_vector
+
+SYNCED_FIELDS = ["category", "name", "description", "price", "stock", "content_hash", "updated_at"]
+SLUG_LENGTH = Product._meta.get_field("slug").max_length
+
+
+def read_rows(path, fmt):
+    """
+    Yield feed rows one at a time, so memory doesn't grow with the file.
+    A JSONL line that doesn't parse is yielded as its JSONDecodeError, for
+    Command.clean to count as invalid rather than abort the import.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as exc:
+                        yield exc
+
+
+def content_hash(row):
+    payload = json.dumps(
+        [row["slug"], row["name"], row["description"], str(row["price"]), row["stock"], row["category"]]
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL supplier feed into the catalog, upserting products by slug "
+        "in batches and skipping rows unchanged since the last sync. Columns: name, price, "
+        "and optionally slug, description, stock, category."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file (.csv, .jsonl or .ndjson).")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Override detection from the extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options["format"] or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+
+        # Categories are few: keep name -> id in memory for the whole run
+        self.categories = dict(Category.objects.values_list("name", "id"))
+        self.stats = {"created": 0, "updated": 0, "unchanged": 0, "invalid": 0}
+
+        rows = enumerate(read_rows(path, fmt), start=1)
+        while batch := list(islice(rows, options["batch_size"])):
+            self.sync_batch(batch)
+
+        if self.stats["created"] or self.stats["updated"]:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            "Created {created}, updated {updated}, unchanged {unchanged}, invalid {invalid}.".format(**self.stats)
+        ))
+
+    def clean(self, line_no, raw):
+        try:
+            if isinstance(raw, json.JSONDecodeError):
+                raise ValueError(f"invalid JSON: {raw.msg}")
+            if not isinstance(raw, dict):
+                raise ValueError("not a JSON object")
+            name = (raw.get("name") or "").strip()
+            if not name:
+                raise ValueError("missing name")
+            row = {
+                "name": name,
+                "slug": slugify(raw.get("slug") or "")[:SLUG_LENGTH],
+                "description": (raw.get("description") or "").strip(),
+                "price": Decimal(str(raw["price"])).quantize(Decimal("0.01")),
+                "stock": max(0, int(raw.get("stock") or 0)),
+                "category": (raw.get("category") or "").strip(),
+            }
+        except (KeyError, ValueError, InvalidOperation) as exc:
+            self.stats["invalid"] += 1
+            self.stderr.write(f"Line {line_no}: skipped ({exc!r})")
+            return None
+        return row
+
+    def resolve_categories(self, names):
+        missing = [name for name in names if name and name not in self.categories]
+        if missing:
+            Category.objects.bulk_create(
+                [Category(name=name, slug=slugify(name)) for name in missing], ignore_conflicts=True
+            )
+            # A name whose slug already exists maps to that category
+            by_slug = {slugify(name): name for name in missing}
+            for slug, category_id in Category.objects.filter(slug__in=by_slug).values_list("slug", "id"):
+                self.categories[by_slug[slug]] = category_id
+
+    def sync_batch(self, batch):
+        rows = [row for row in (self.clean(line_no, raw) for line_no, raw in batch) if row]
+        self.resolve_categories({row["category"] for row in rows})
+
+        # Rows without a slug derive one from the name; look up every candidate at once
+        for row in rows:
+            row["explicit"] = bool(row["slug"])
+            row["slug"] = row["slug"] or slugify(row["name"])[:SLUG_LENGTH] or "product"
+        existing = {
+            slug: (name, digest)
+            for slug, name, digest in Product.objects.filter(slug__in={r["slug"] for r in rows})
+            .values_list("slug", "name", "content_hash")
+        }
+
+        pending = {}
+        for row in rows:
+            if not row["explicit"]:
+                row["slug"] = self.free_slug(row, existing, pending)
+            row["content_hash"] = content_hash(row)
+            if existing.get(row["slug"], (None, None))[1] == row["content_hash"]:
+                self.stats["unchanged"] += 1
+                continue
+            pending[row["slug"]] = row  # a repeated slug in one batch: last row wins
+
+        if not pending:
+            return
+        products = [
+            Product(
+                slug=slug,
+                name=row["name"],
+                description=row["description"],
+                price=row["price"],
+                stock=row["stock"],
+                category_id=self.categories.get(row["category"]),
+                content_hash=row["content_hash"],
+            )
+            for slug, row in pending.items()
+        ]
+        Product.objects.bulk_create(
+            products, update_conflicts=True, unique_fields=["slug"], update_fields=SYNCED_FIELDS
+        )
+        # bulk_create skips Product.save, so refresh search vectors per batch in one UPDATE
+        refresh_search_vector(Product.objects.filter(slug__in=pending))
+
+        updated = sum(1 for slug in pending if slug in existing)
+        self.stats["updated"] += updated
+        self.stats["created"] += len(pending) - updated
+
+    def free_slug(self, row, existing, pending):
+        """
+        A derived slug belongs to this row unless a product (or an earlier row in
+        this batch) with a different name already has it; then add -2, -3, ...
+        """
+        base = row["slug"]
+        slug, n = base, 1
+        while True:
+            owner = pending[slug]["name"] if slug in pending else None
+            if owner is None and slug not in existing and n > 1:
+                found = Product.objects.filter(slug=slug).values_list("name", "content_hash").first()
+                if found:
+                    existing[slug] = found
+            if owner is None and slug in existing:
+                owner = existing[slug][0]
+            if owner is None or owner == row["name"]:
+                return slug
+            n += 1
+            suffix = f"-{n}"
+            slug = base[:SLUG_LENGTH - len(suffix)] + suffix
@@ -0,0 +1,195 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+
+from store.cart import add_to_order
+from store.models import Category, Order, OrderItem, Product
+
+JSON = {"headers": {"accept": "application/json"}}
+
+
+def percentile(cuts, p):
+    return round(cuts[p - 1] * 1000, 2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the storefront, cart, checkout, dashboard and order pages through the test "
+        "client against the current database (e.g. after seed_bench) and record latency "
+        "percentiles and query counts as JSON. Every write is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3, help="Unrecorded requests per scenario.")
+        parser.add_argument("--cold", action="store_true", help="Clear the cache before every request.")
+        parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="Run just these scenarios.")
+        parser.add_argument("-o", "--output", default="bench.json")
+        parser.add_argument("--compare", metavar="PATH", help="Earlier output to print deltas against.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 2:
+            raise CommandError("Need at least 2 iterations for percentiles.")
+        # Well-stocked products, so checkout keeps succeeding
+        products = list(Product.objects.filter(stock__gt=0).order_by("-stock", "id")[:2])
+        if not products:
+            raise CommandError("No products in stock; run seed_bench first.")
+        product = products[0]
+        self.fixtures = {
+            "product": product,
+            "other_product": products[-1],
+            "category": Category.objects.annotate(n=Count("products")).order_by("-n").first(),
+            # The customer with the longest order history, for manage_orders
+            "shopper": User.objects.annotate(n=Count("orders")).order_by("-n", "id").first(),
+            "term": product.name.split()[0],
+        }
+
+        scenarios = self.scenarios()
+        names = options["only"] or list(scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}. Choose from {', '.join(scenarios)}.")
+
+        report = {
+            "meta": {
+                "started": now().isoformat(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "cold_cache": options["cold"],
+                "products": Product.objects.count(),
+                "orders": Order.objects.count(),
+                "order_items": OrderItem.objects.count(),
+            },
+            "scenarios": {},
+        }
+        # Outside the test runner, the test client's host name isn't an allowed host
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name in names:
+                result = self.measure(scenarios[name], options["iterations"], options["warmup"], options["cold"])
+                report["scenarios"][name] = result
+                self.stdout.write(
+                    f"{name:<22} {result['status']}  p50 {result['p50_ms']:>8.2f}ms  "
+                    f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  queries {result['queries']}"
+                )
+
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}."))
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text()), report)
+
+    def scenarios(self):
+        """name -> (user, prepare, request): `prepare(client)` runs before each request, untimed."""
+        f = self.fixtures
+        product, other, category = f["product"], f["other_product"], f["category"]
+        home = reverse("home")
+
+        def get(url, data=None, **extra):
+            return lambda client: client.get(url, data, **extra)
+
+        def post(url, data=None, **extra):
+            return lambda client: client.post(url, data, **extra)
+
+        def fill_cart(client):
+            order, _ = Order.objects.get_or_create(user=self.user, paid=False)
+            add_to_order(order, product.pk, 1)
+            add_to_order(order, other.pk, 2)
+
+        def cart_line(client):
+            fill_cart(client)
+            self.line = OrderItem.objects.get(order__user=self.user, order__paid=False, product=product)
+
+        def second_page(client):
+            first = client.get(reverse("product_list")).json()
+            self.cursor = first["next_cursor"] or ""
+
+        return {
+            "home": (None, None, get(home)),
+            "home_search": (None, None, get(home, {"q": f["term"]})),
+            "home_category": (None, None, get(home, {"category": category.pk if category else ""})),
+            "home_price_range": (None, None, get(home, {"min_price": "25", "max_price": "49.99"})),
+            "home_sort_price": (None, None, get(home, {"sort": "price_asc"})),
+            "home_page_2": (None, second_page, lambda client: client.get(home, {"cursor": self.cursor})),
+            "home_signed_in": ("shopper", None, get(home)),
+            "product_list_json": (None, None, get(reverse("product_list"))),
+            "add_to_cart": ("shopper", None, post(reverse("add_to_cart", args=[product.pk]), {"quantity": 1})),
+            "add_to_cart_json": ("shopper", None,
+                                 post(reverse("add_to_cart", args=[product.pk]), {"quantity": 1}, **JSON)),
+            "cart": ("shopper", fill_cart, get(reverse("cart"))),
+            "update_cart_json": ("shopper", cart_line, lambda client: client.post(
+                reverse("update_cart", args=[self.line.pk]), {"action": "increase"}, **JSON)),
+            "checkout_get": ("shopper", fill_cart, get(reverse("checkout"))),
+            "checkout_post": ("shopper", fill_cart, post(reverse("checkout"), {"shipping_address": "1 Bench St"})),
+            "manage_orders": ("shopper", None, get(reverse("manage_orders"))),
+            "dashboard": ("staff", None, get(reverse("dashboard"))),
+            "dashboard_paid_30d": ("staff", None, get(reverse("dashboard"), {"status": "paid", "days": "30"})),
+            "dashboard_category": ("staff", None,
+                                   get(reverse("dashboard"), {"category": category.name if category else ""})),
+        }
+
+    def measure(self, scenario, iterations, warmup, cold):
+        user, prepare, request = scenario
+        timings, query_counts, status = [], [], None
+        with transaction.atomic():
+            client = Client()
+            if user == "staff":
+                self.user = User.objects.create(username="run_bench_staff", is_staff=True)
+            else:
+                self.user = self.fixtures["shopper"] or User.objects.create(username="run_bench_shopper")
+            if user:
+                client.force_login(self.user)
+
+            for i in range(warmup + iterations):
+                if prepare:
+                    prepare(client)
+                if cold:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = request(client)
+                    elapsed = time.perf_counter() - started
+                if i >= warmup:
+                    timings.append(elapsed)
+                    query_counts.append(len(queries))
+                    status = response.status_code
+            transaction.set_rollback(True)
+
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "status": status,
+            "p50_ms": percentile(cuts, 50),
+            "p95_ms": percentile(cuts, 95),
+            "p99_ms": percentile(cuts, 99),
+            "mean_ms": round(statistics.fmean(timings) * 1000, 2),
+            "max_ms": round(max(timings) * 1000, 2),
+            "queries": round(statistics.median(query_counts)),
+            "queries_max": max(query_counts),
+        }
+
+    def compare(self, before, after):
+        self.stdout.write(f"\nCompared with the run from {before['meta']['started']}:")
+        for name, new in after["scenarios"].items():
+            old = before["scenarios"].get(name)
+            if old is None:
+                self.stdout.write(f"{name:<22} (new)")
+                continue
+            change = (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+            queries = new["queries"] - old["queries"]
+            line = (f"{name:<22} p50 {old['p50_ms']:>8.2f} -> {new['p50_ms']:>8.2f}ms ({change:+.0f}%)  "
+                    f"queries {old['queries']} -> {new['queries']}")
+            if queries > 0 or change > 20:
+                line = self.style.ERROR(line)
+            elif queries < 0 or change < -20:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,182 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from store.catalog import bump_catalog_version
+from store.models import Category, Order, OrderItem, Product
+from store.search import refresh_search_vector
+
+# Everything generated here is tagged with this prefix so --clear can find it
+PREFIX = "bench"
+BENCH_PASSWORD = "bench-password"
+
+ADJECTIVES = ["Wireless", "Compact", "Classic", "Smart", "Portable", "Premium", "Ergonomic", "Vintage",
+              "Organic", "Rugged", "Slim", "Deluxe"]
+NOUNS = ["Headphones", "Lamp", "Backpack", "Kettle", "Keyboard", "Chair", "Speaker", "Jacket", "Watch",
+         "Blender", "Notebook", "Camera", "Sneakers", "Desk", "Mug", "Monitor"]
+WORDS = ("durable lightweight stainless waterproof rechargeable adjustable handmade cotton aluminium "
+         "bluetooth travel kitchen office outdoor gift everyday warranty").split()
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep the spread-out created_at values instead of auto_now_add's now()."""
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic categories, products, users, orders and order items for "
+        "benchmarking (see run_bench). Defaults give 100k products and 1M order items."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--orders", type=int, default=100_000)
+        parser.add_argument("--items", type=int, default=1_000_000, help="Approximate order item count.")
+        parser.add_argument("--days", type=int, default=365, help="Spread orders over this many past days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data sets.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously generated data first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.started = now()
+
+        if options["clear"]:
+            self.clear()
+
+        category_ids = self.seed_categories(options["categories"])
+        products = self.seed_products(options["products"], category_ids)
+        user_ids = self.seed_users(options["users"])
+        with explicit_created_at(Order):
+            self.seed_orders(options["orders"], options["items"], options["days"], user_ids, products)
+
+        refresh_search_vector(Product.objects.filter(slug__startswith=f"{PREFIX}-"))
+        call_command("rollup_sales", "--full", stdout=self.stdout)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {(now() - self.started).total_seconds():.1f}s."))
+
+    def clear(self):
+        with transaction.atomic():
+            Order.objects.filter(user__username__startswith=f"{PREFIX}_").delete()
+            User.objects.filter(username__startswith=f"{PREFIX}_").delete()
+            Product.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+            Category.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+
+    def seed_categories(self, count):
+        existing = Category.objects.filter(slug__startswith=f"{PREFIX}-").count()
+        Category.objects.bulk_create(
+            Category(name=f"{NOUNS[i % len(NOUNS)]}s {i}", slug=f"{PREFIX}-{i}")
+            for i in range(existing, count)
+        )
+        self.stdout.write(f"Categories: {max(0, count - existing)} created.")
+        return list(Category.objects.filter(slug__startswith=f"{PREFIX}-").values_list("id", flat=True))
+
+    def seed_products(self, count, category_ids):
+        rng = self.rng
+        start = Product.objects.filter(slug__startswith=f"{PREFIX}-").count()
+
+        def generate():
+            for i in range(start, count):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}"
+                yield Product(
+                    name=name,
+                    slug=f"{PREFIX}-{i}",
+                    description=" ".join(rng.choices(WORDS, k=rng.randint(8, 30))).capitalize() + ".",
+                    # Log-ish spread, so every price bucket has products
+                    price=Decimal(round(rng.lognormvariate(3.5, 1.0), 2) + 1).quantize(Decimal("0.01")),
+                    # Plenty of stock, so checkout benchmarks don't run dry
+                    stock=rng.randint(1_000, 100_000),
+                    category_id=rng.choice(category_ids) if category_ids and rng.random() < 0.95 else None,
+                )
+
+        for batch in batched(generate(), self.batch_size):
+            Product.objects.bulk_create(batch)
+        self.stdout.write(f"Products: {max(0, count - start)} created.")
+        return list(Product.objects.filter(slug__startswith=f"{PREFIX}-").values_list("id", "price"))
+
+    def seed_users(self, count):
+        start = User.objects.filter(username__startswith=f"{PREFIX}_").count()
+        # Hashing is deliberately slow; every bench user shares one hash
+        password = make_password(BENCH_PASSWORD)
+        users = (User(username=f"{PREFIX}_{i}", email=f"{PREFIX}_{i}@example.com", password=password)
+                 for i in range(start, count))
+        for batch in batched(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        self.stdout.write(f"Users: {max(0, count - start)} created.")
+        return list(User.objects.filter(username__startswith=f"{PREFIX}_").values_list("id", flat=True))
+
+    def seed_orders(self, count, item_count, days, user_ids, products):
+        if not (count and user_ids and products):
+            return
+        rng = self.rng
+        lines_per_order = max(1, round(item_count / count))
+        # Every twentieth order is an open cart; a user has at most one (see Order.Meta)
+        has_cart = set(Order.objects.filter(paid=False).values_list("user_id", flat=True))
+        free_users = [user_id for user_id in user_ids if user_id not in has_cart]
+        cart_users = rng.sample(free_users, k=min(len(free_users), count // 20))
+
+        orders_created = items_created = 0
+        for batch_start in range(0, count, self.batch_size):
+            orders = []
+            for i in range(batch_start, min(count, batch_start + self.batch_size)):
+                created_at = self.started - timedelta(seconds=rng.uniform(0, days * 86400))
+                if i < len(cart_users):
+                    orders.append(Order(user_id=cart_users[i], created_at=created_at))
+                    continue
+                paid_at = min(self.started, created_at + timedelta(minutes=rng.randint(1, 60)))
+                orders.append(Order(user_id=rng.choice(user_ids), created_at=created_at, paid=True,
+                                    paid_at=paid_at, shipping_address=f"{i} Bench Street"))
+            # Lines first, so each order is inserted with its stored totals
+            lines = []
+            for order in orders:
+                n = max(1, min(len(products), round(rng.gauss(lines_per_order, lines_per_order / 3))))
+                order_lines = [
+                    OrderItem(product_id=product_id, price=price,
+                              quantity=rng.choices((1, 2, 3, 4), weights=(70, 20, 7, 3))[0])
+                    for product_id, price in rng.sample(products, n)
+                ]
+                order.total_amount = sum(line.total_price() for line in order_lines)
+                order.item_count = sum(line.quantity for line in order_lines)
+                lines.append(order_lines)
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                items = []
+                for order, order_lines in zip(orders, lines):
+                    for line in order_lines:
+                        line.order_id = order.pk
+                    items.extend(order_lines)
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+            orders_created += len(orders)
+            items_created += len(items)
+        self.stdout.write(f"Orders: {orders_created} created, {items_created} items.")
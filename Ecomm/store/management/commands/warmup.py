@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.warmup import import_times, warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the worker warm-up (templates, URLs, caches, pages, database connections) and "
+        "report how long each step and the slowest start-up imports take. Workers run the "
+        "same steps at start-up with WARMUP=1, see ecommerce/wsgi.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--imports", type=int, default=20,
+                            help="Show the N slowest imports by cumulative time (0 to skip).")
+
+    def handle(self, *args, **options):
+        failed = False
+        for step, seconds, result in warmup():
+            failed = failed or str(result).startswith("failed:")
+            self.stdout.write(f"{step:<10} {seconds * 1000:8.1f} ms  {result}")
+
+        if options["imports"]:
+            # What a worker imports before serving: the entry point and the URLconf (views, admin)
+            modules = [settings.WSGI_APPLICATION.rsplit(".", 1)[0], settings.ROOT_URLCONF]
+            times = import_times(modules)
+            total = sum(own for _, own, _, _ in times)
+            self.stdout.write(f"\nImports: {len(times)} modules, {total / 1000:.1f} ms")
+            self.stdout.write(f"{'cumulative':>12} {'self':>10}  module")
+            for module, own, cumulative, depth in sorted(times, key=lambda row: -row[2])[:options["imports"]]:
+                self.stdout.write(f"{cumulative / 1000:9.1f} ms {own / 1000:7.1f} ms  {'  ' * depth}{module}")
+
+        if failed:
+            raise CommandError("Some warm-up steps failed, see above.")
+        self.stdout.write(self.style.SUCCESS("Warm-up complete."))
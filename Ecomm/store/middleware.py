@@ -0,0 +1,191 @@
+# store/middleware.py
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .routers import RoutingState, _state
+
+logger = logging.getLogger(__name__)
+
+# The timing of the request being handled; shared with sync_to_async threads
+_current = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    """Query and template time for one request. Also the connections' execute wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements[sql, repr(params)] += 1
+
+    def repeated(self, threshold):
+        """(count, sql) for identical statements (same SQL and parameters) run `threshold`+ times."""
+        return [(count, sql) for (sql, _), count in self.statements.most_common() if count >= threshold]
+
+    def similar(self, threshold):
+        """(count, sql) for SQL run `threshold`+ times with varying parameters, e.g. once per order."""
+        shapes = Counter()
+        for sql, _ in self.statements:
+            shapes[sql] += 1
+        return [(count, sql) for sql, count in shapes.most_common() if count >= threshold]
+
+    def header(self, total):
+        return ", ".join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f"tpl;dur={self.template_time * 1000:.1f}",
+            f"view;dur={total * 1000:.1f}",
+        ])
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection when it opens
+    (store.signals), so queries are timed on whichever thread runs them,
+    including the sync_to_async threads behind async views.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def time_render(render, *args):
+    """Call `render(*args)`, adding its duration to the request's template time."""
+    timing = _current.get()
+    if timing is None or timing.template_depth:
+        # Outside a request, or a template rendered by one already being counted
+        return render(*args)
+    timing.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return render(*args)
+    finally:
+        timing.template_time += time.perf_counter() - started
+        timing.template_depth -= 1
+
+
+class ServerTimingMiddleware:
+    """
+    Send `Server-Timing` headers with each response's query count, database
+    time, template render time and total view time, and log requests over
+    their URL name's budget (SERVER_TIMING_BUDGETS, in ms), repeating an
+    identical query (SERVER_TIMING_REPEAT_THRESHOLD times) or running one
+    statement for many different parameters (SERVER_TIMING_SIMILAR_THRESHOLD),
+    the usual signs of a query in a loop.
+
+    Queries are timed by `time_queries` and templates by the
+    store.templating backend; both report to the request's RequestTiming.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budgets = getattr(settings, "SERVER_TIMING_BUDGETS", {})
+        self.repeat_threshold = getattr(settings, "SERVER_TIMING_REPEAT_THRESHOLD", 3)
+        self.similar_threshold = getattr(settings, "SERVER_TIMING_SIMILAR_THRESHOLD", 10)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timing, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, time.perf_counter() - started)
+
+    def start(self):
+        timing = RequestTiming()
+        return timing, _current.set(timing), time.perf_counter()
+
+    def finish(self, request, response, timing, total):
+        response["Server-Timing"] = timing.header(total)
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else request.path
+        budget = self.budgets.get(view_name)
+        if budget is not None and total * 1000 > budget:
+            logger.warning(
+                "%s %s (%s) took %.0fms, over its %sms budget: %d queries in %.0fms, templates %.0fms",
+                request.method, request.path, view_name, total * 1000, budget,
+                timing.queries, timing.db_time * 1000, timing.template_time * 1000,
+            )
+        for count, sql in timing.repeated(self.repeat_threshold):
+            logger.warning("%s (%s) ran the same query %d times: %.300s", request.path, view_name, count, sql)
+        for count, sql in timing.similar(self.similar_threshold):
+            logger.warning("%s (%s) ran a query %d times with different parameters: %.300s",
+                           request.path, view_name, count, sql)
+        return response
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Set up database routing for the request (store.routers). After a request
+    that wrote, a short-lived cookie pins the browser's reads to the primary
+    for DATABASE_STICKY_SECONDS, so replica lag never hides the user's own changes.
+    """
+
+    cookie_name = "db_primary"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, "DATABASE_STICKY_SECONDS", 10)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(pinned=self.cookie_name in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=self.cookie_name in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state):
+        if state.wrote:
+            response.set_cookie(self.cookie_name, "1", max_age=self.sticky_seconds, httponly=True, samesite="Lax")
+        return response
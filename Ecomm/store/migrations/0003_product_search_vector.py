@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:57
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes are PostgreSQL-only; other backends use the icontains fallback
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE store_product SET search_vector = "
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS store_product_search_vector_gin "
+        "ON store_product USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS store_product_name_trgm_gin "
+        "ON store_product USING gin (name gin_trgm_ops)"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS store_product_search_vector_gin")
+    schema_editor.execute("DROP INDEX IF EXISTS store_product_name_trgm_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_image'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:06
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_carts(apps, schema_editor):
+    """Fold duplicate unpaid orders and duplicate order lines together so the constraints apply."""
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+
+    duplicated_users = (
+        Order.objects.filter(paid=False, user__isnull=False)
+        .values('user').annotate(n=Count('id')).filter(n__gt=1).values_list('user', flat=True)
+    )
+    for user_id in list(duplicated_users):
+        keeper, *others = Order.objects.filter(user_id=user_id, paid=False).order_by('id')
+        OrderItem.objects.filter(order__in=others).update(order=keeper)
+        Order.objects.filter(pk__in=[o.pk for o in others]).delete()
+
+    duplicated_lines = (
+        OrderItem.objects.values('order', 'product')
+        .annotate(n=Count('id'), keep=Min('id'), total=Sum('quantity')).filter(n__gt=1)
+    )
+    for line in list(duplicated_lines):
+        OrderItem.objects.filter(pk=line['keep']).update(quantity=line['total'])
+        OrderItem.objects.filter(order=line['order'], product=line['product']).exclude(pk=line['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('paid', False)), fields=('user',), name='one_unpaid_order_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='orderitem_order_product_uniq'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    # One UPDATE with correlated sums over each order's lines
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    lines = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+    money = DecimalField(max_digits=12, decimal_places=2)
+    Order.objects.update(
+        total_amount=Coalesce(
+            Subquery(lines.annotate(total=Sum(F('price') * F('quantity'), output_field=money)).values('total')),
+            Value(0), output_field=money,
+        ),
+        item_count=Coalesce(Subquery(lines.annotate(units=Sum('quantity')).values('units')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_recommendations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='order_user_newest_idx'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,19 @@
 # store/models.py
+from datetime import timedelta
 
-import os
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
-from dotenv import load_dotenv
-from django.utils.html import format_html
 
-load_dotenv()
+from .images import fallback_image, refresh_derivatives, srcset
+from .search import refresh_search_vector
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -33,35 +34,59 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by saves and by the bulk writers that bypass them; indexed for conditional GETs
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized WebP/JPEG copies of `image`, see store.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # Weighted name/description vector, GIN-indexed on PostgreSQL (see migration 0003)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Hash of the supplier feed row last imported by `import_catalog`
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+
+    class Meta:
+        # Keyset pagination indexes for the storefront sorts
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="product_newest_idx"),
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        """Generate slug if missing and save product."""
+        """Generate slug if missing, save product and refresh its search vector."""
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"name", "description"} & set(update_fields):
+            refresh_search_vector(
+                Product.objects.using(self._state.db).filter(pk=self.pk)
+            )
+        if update_fields is None or "image" in update_fields:
+            refresh_derivatives(self)
+
     def get_or_fetch_image(self):
         """
         Returns the image URL.
-        If missing, fetches an online image using Unsplash Source.
+        If missing, a placeholder rendered from the product name (no network request).
         """
         if self.image:
             return self.image.url
+        return fallback_image(self.name)
 
-        # Generate Unsplash Source URL
-        search_term = self.name.replace(" ", "+")
-        return f"https://source.unsplash.com/400x300/?{search_term}"
+    def image_placeholder(self):
+        """Inline blurred preview shown until the image loads; "" without one (see store.images)."""
+        return (self.image_derivatives or {}).get("placeholder", "")
 
-    def image_preview(self):
-        if self.image:
-            return format_html(
-                '<img src="{}" style="max-width: 150px; max-height: 150px; object-fit: contain;" />',
-                self.image.url
-            )
-        return "No Image"
+    def image_color(self):
+        return (self.image_derivatives or {}).get("color", "")
+
+    def image_srcset(self):
+        return srcset(self.image_derivatives, "jpeg")
+
+    def webp_srcset(self):
+        return srcset(self.image_derivatives, "webp")
 
-    image_preview.short_description = 'Image Preview'
     def __str__(self):
         return self.name
 
@@ -69,8 +94,19 @@ class Product(models.Model):
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/')
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     alt = models.CharField(max_length=255, blank=True)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        refresh_derivatives(self)
+
+    def image_srcset(self):
+        return srcset(self.image_derivatives, "jpeg")
+
+    def webp_srcset(self):
+        return srcset(self.image_derivatives, "webp")
+
     def __str__(self):
         return f"{self.product.name} Image"
 
@@ -80,14 +116,34 @@ class Order(models.Model):
         settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.SET_NULL, null=True, blank=True
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also bumped whenever the lines change, see store.cart.refresh_order_totals
+    updated_at = models.DateTimeField(auto_now=True)
     paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True, db_index=True)
     shipping_address = models.TextField(blank=True, null=True)
+    # Sum of the lines and of their quantities, kept in step by the cart mutations
+    # (store.cart.refresh_order_totals) and frozen at checkout
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination for the dashboard order table and a customer's order history
+            models.Index(fields=["-created_at", "-id"], name="order_newest_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_newest_idx"),
+        ]
+        constraints = [
+            # A user has at most one cart; add_to_cart relies on this under concurrency
+            models.UniqueConstraint(
+                fields=["user"], condition=models.Q(paid=False), name="one_unpaid_order_per_user"
+            ),
+        ]
 
     def total(self):
-        return sum(item.total_price() for item in self.items.all())
-
-    def item_count(self):
-        return sum(item.quantity for item in self.items.all())
+        # Prefer the live sum annotated by store.views.load_cart
+        if hasattr(self, "items_total"):
+            return self.items_total or 0
+        return self.total_amount
 
     def __str__(self):
         return f"Order #{self.id} by {self.user}"
@@ -98,9 +154,92 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # One line per product; add_to_cart upserts against this
+            models.UniqueConstraint(fields=["order", "product"], name="orderitem_order_product_uniq"),
+        ]
 
     def total_price(self):
         return self.price * self.quantity
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
+
+
+class DailySales(models.Model):
+    """
+    Pre-aggregated paid sales per day and category, read by the dashboard.
+    Rows with no category hold the day's totals across all categories.
+    Maintained by checkout and the `rollup_sales` management command.
+    """
+    date = models.DateField()
+    category = models.ForeignKey(
+        Category, related_name='daily_sales', on_delete=models.CASCADE, null=True, blank=True
+    )
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "category"], name="daily_sales_date_category_uniq"),
+            models.UniqueConstraint(
+                fields=["date"], condition=models.Q(category__isnull=True), name="daily_sales_date_total_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.category or 'All'}: {self.revenue}"
+
+
+# Longest a checkout can take to commit after stamping paid_at: incremental jobs
+# treat more recently paid orders as possibly not visible to them yet
+PAYMENT_SETTLE_TIME = timedelta(minutes=5)
+
+
+class Checkpoint(models.Model):
+    """Last successful run of an incremental batch job, keyed by job name."""
+    name = models.CharField(max_length=100, unique=True)
+    timestamp = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.timestamp}"
+
+
+class CoPurchase(models.Model):
+    """
+    Number of paid orders containing both products, stored in both directions;
+    the row with product == other holds the product's own paid order count.
+    Maintained incrementally by the `build_recommendations` command.
+    """
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    other = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index for per-product lookups; the upsert in store.recommendations relies on it
+            models.UniqueConstraint(fields=["product", "other"], name="copurchase_pair_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id}: {self.orders}"
+
+
+class RelatedProduct(models.Model):
+    """Top products bought together with `product`, best first, scored from CoPurchase."""
+    product = models.ForeignKey(Product, related_name='related_products', on_delete=models.CASCADE)
+    related = models.ForeignKey(Product, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="related_product_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} #{self.rank}: {self.related_id}"
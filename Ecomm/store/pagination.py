@@ -0,0 +1,94 @@
+# store/pagination.py
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = "store.pagination.cursor"
+
+
+def _encode_value(value):
+    # Strings round-trip through the field's own conversion when filtering,
+    # so datetimes and decimals keep full precision.
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(ordering, values):
+    # The ordering is signed in with the values, so a cursor only resumes the sort it came from
+    payload = {"order": list(ordering), "values": [_encode_value(v) for v in values]}
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, ordering):
+    """
+    Return the cursor values, or None if the token is missing, invalid, or
+    was issued for a different ordering (e.g. replayed with another sort).
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("order") != list(ordering):
+        return None
+    values = payload.get("values")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    return values
+
+
+def _after(ordering, values):
+    """
+    Build the "row comes after `values`" condition for a multi-column ordering:
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _seek(queryset, cursor):
+    ordering = [str(field) for field in queryset.query.order_by]
+    values = decode_cursor(cursor, ordering)
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset, ordering
+
+
+def _page(items, ordering, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(ordering, [getattr(last, f.lstrip("-")) for f in ordering])
+    return items, next_cursor
+
+
+def keyset_page(queryset, cursor=None, page_size=24):
+    """
+    Fetch one page of an ordered queryset using keyset (seek) pagination.
+
+    The queryset's ordering must end in a unique column (e.g. "-id") so that
+    every row has a distinct position, and its columns must compare exactly:
+    order by rounded or scaled values rather than floats. Returns (items, next_cursor); the
+    cursor is None on the last page.
+    """
+    queryset, ordering = _seek(queryset, cursor)
+    return _page(list(queryset[:page_size + 1]), ordering, page_size)
+
+
+async def akeyset_page(queryset, cursor=None, page_size=24):
+    """Async version of `keyset_page`."""
+    queryset, ordering = _seek(queryset, cursor)
+    return _page([item async for item in queryset[:page_size + 1]], ordering, page_size)
@@ -0,0 +1,110 @@
+# store/recommendations.py
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from .models import CoPurchase, OrderItem, RelatedProduct
+
+RELATED_PER_PRODUCT = 8
+
+
+def count_copurchases(orders):
+    """
+    Add every pair of products in `orders` (a queryset of paid orders) to the
+    co-purchase counts, diagonal included, with one INSERT ... SELECT that
+    self-joins the order lines and upserts the grouped counts. The database
+    does the pairing and grouping, so memory use doesn't depend on order volume.
+    Returns the number of pair rows written.
+    """
+    connection = connections[router.db_for_write(CoPurchase)]
+    qn = connection.ops.quote_name
+    table = qn(CoPurchase._meta.db_table)
+    lines = qn(OrderItem._meta.db_table)
+    order_col = qn(OrderItem._meta.get_field("order").column)
+    product_col = qn(OrderItem._meta.get_field("product").column)
+    order_ids, params = orders.values("pk").query.sql_with_params()
+
+    # INSERT ... SELECT ... ON CONFLICT works on PostgreSQL and SQLite 3.24+
+    sql = (
+        f"INSERT INTO {table} ({qn('product_id')}, {qn('other_id')}, {qn('orders')}) "
+        f"SELECT a.{product_col}, b.{product_col}, COUNT(*) "
+        f"FROM {lines} a INNER JOIN {lines} b ON a.{order_col} = b.{order_col} "
+        f"WHERE a.{order_col} IN ({order_ids}) "
+        f"GROUP BY a.{product_col}, b.{product_col} "
+        f"ON CONFLICT ({qn('product_id')}, {qn('other_id')}) "
+        f"DO UPDATE SET {qn('orders')} = {table}.{qn('orders')} + excluded.{qn('orders')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def score_products(product_ids, limit=RELATED_PER_PRODUCT, min_orders=2):
+    """
+    Replace the stored related products of `product_ids` with their `limit`
+    best partners by cosine similarity, orders(a, b) / sqrt(orders(a) * orders(b)),
+    which keeps bestsellers from topping every list. Pairs bought together in
+    fewer than `min_orders` orders are ignored as noise.
+    """
+    pairs = defaultdict(list)
+    for product, other, orders in (
+        CoPurchase.objects.filter(product__in=product_ids, orders__gte=min_orders)
+        .exclude(other=F("product"))
+        .values_list("product", "other", "orders")
+    ):
+        pairs[product].append((other, orders))
+
+    partners = {other for candidates in pairs.values() for other, _ in candidates}
+    totals = dict(
+        CoPurchase.objects.filter(product__in=partners | set(pairs), other=F("product"))
+        .values_list("product", "orders")
+    )
+
+    rows = []
+    for product, candidates in pairs.items():
+        scored = [
+            (orders / math.sqrt(totals[product] * totals[other]), other)
+            for other, orders in candidates
+            if totals.get(product) and totals.get(other)
+        ]
+        for rank, (score, other) in enumerate(heapq.nlargest(limit, scored), start=1):
+            rows.append(RelatedProduct(product_id=product, related_id=other, rank=rank, score=score))
+
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product__in=product_ids).delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _related_rows(product_ids):
+    return (
+        RelatedProduct.objects.filter(product__in=product_ids)
+        .exclude(related__in=product_ids)
+        .select_related("related")
+    )
+
+
+def _best(rows, limit):
+    # A product related to several of the given ones ranks by its summed score
+    scores, products = defaultdict(float), {}
+    for row in rows:
+        scores[row.related_id] += row.score
+        products[row.related_id] = row.related
+    best = heapq.nlargest(limit, scores, key=lambda pk: (scores[pk], -pk))
+    return [products[pk] for pk in best]
+
+
+def related_products(product_ids, limit=4):
+    """
+    Products most often bought with any of `product_ids` (e.g. a cart), best
+    first, not including those products: one lookup on the (product, rank) index.
+    """
+    return _best(_related_rows(product_ids), limit)
+
+
+async def arelated_products(product_ids, limit=4):
+    """Async version of `related_products`."""
+    return _best([row async for row in _related_rows(product_ids)], limit)
@@ -0,0 +1,116 @@
+# store/reports.py
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import localdate, make_aware
+
+from .models import DailySales, OrderItem
+
+LINE_REVENUE = Sum(F("price") * F("quantity"), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _bump(day, category_id, revenue, units):
+    row, _ = DailySales.objects.get_or_create(date=day, category_id=category_id)
+    DailySales.objects.filter(pk=row.pk).update(
+        revenue=F("revenue") + revenue,
+        orders=F("orders") + 1,
+        units=F("units") + units,
+    )
+
+
+def record_paid_order(order):
+    """
+    Fold a just-paid order into the rollup for its payment day. Checkout runs
+    it once the payment has committed, so the shared totals row is only
+    locked for this short transaction.
+    """
+    day = localdate(order.paid_at)
+    lines = (
+        OrderItem.objects.filter(order=order)
+        .values("product__category")
+        .annotate(revenue=LINE_REVENUE, units=Sum("quantity"))
+    )
+    total_revenue = 0
+    total_units = 0
+    with transaction.atomic():
+        for line in lines:
+            total_revenue += line["revenue"]
+            total_units += line["units"]
+            if line["product__category"] is not None:
+                _bump(day, line["product__category"], line["revenue"], line["units"])
+        if total_units:
+            _bump(day, None, total_revenue, total_units)
+
+
+def _day_range(day):
+    start = make_aware(datetime.combine(day, time.min))
+    return Q(order__paid_at__gte=start, order__paid_at__lt=start + timedelta(days=1))
+
+
+def rebuild_sales_days(days):
+    """Recompute the rollup rows for the given dates from paid order lines."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+
+    # Half-open ranges rather than paid_at::date so the paid_at index is used
+    in_days = Q()
+    for day in days:
+        in_days |= _day_range(day)
+    paid_lines = OrderItem.objects.filter(in_days, order__paid=True).annotate(day=TruncDate("order__paid_at"))
+
+    per_category = (
+        paid_lines.filter(product__category__isnull=False)
+        .values("day", "product__category")
+        .annotate(revenue=LINE_REVENUE, units=Sum("quantity"), orders=Count("order", distinct=True))
+        .order_by()
+    )
+    totals = (
+        paid_lines.values("day")
+        .annotate(revenue=LINE_REVENUE, units=Sum("quantity"), orders=Count("order", distinct=True))
+        .order_by()
+    )
+
+    rows = [
+        DailySales(date=r["day"], category_id=r["product__category"],
+                   revenue=r["revenue"], units=r["units"], orders=r["orders"])
+        for r in per_category
+    ] + [
+        DailySales(date=r["day"], revenue=r["revenue"], units=r["units"], orders=r["orders"])
+        for r in totals
+    ]
+
+    with transaction.atomic():
+        DailySales.objects.filter(date__in=days).delete()
+        DailySales.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _summary_rows(category, days):
+    rows = DailySales.objects.all()
+    if category:
+        rows = rows.filter(category__name=category)
+    else:
+        rows = rows.filter(category__isnull=True)
+    if days is not None:
+        rows = rows.filter(date__gte=localdate() - timedelta(days=days))
+    return rows
+
+
+def sales_summary(category=None, days=None):
+    """
+    Revenue, paid order count and units from the rollup.
+    `category` is a category name, `days` limits to the last N days.
+    """
+    summary = _summary_rows(category, days).aggregate(revenue=Sum("revenue"), orders=Sum("orders"), units=Sum("units"))
+    return {key: value or 0 for key, value in summary.items()}
+
+
+async def asales_summary(category=None, days=None):
+    """Async version of `sales_summary`."""
+    summary = await _summary_rows(category, days).aaggregate(
+        revenue=Sum("revenue"), orders=Sum("orders"), units=Sum("units")
+    )
+    return {key: value or 0 for key, value in summary.items()}
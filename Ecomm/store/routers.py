@@ -0,0 +1,55 @@
+# store/routers.py
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Reads of these models may be served by a replica; everything else (carts,
+# orders, sessions, users) reads from the primary
+REPLICA_MODELS = {
+    "store.category", "store.product", "store.productimage", "store.dailysales", "store.relatedproduct",
+}
+
+# Routing state of the request being handled, set by PrimaryStickinessMiddleware.
+# Outside requests (commands, shell) there is none and every read uses the primary.
+_state = ContextVar("db_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        # Reads must see this user's recent writes
+        self.pinned = pinned
+        self.wrote = False
+
+
+def read_replica():
+    """
+    Alias to read from for lag-tolerant queries: a random DATABASE_REPLICAS entry,
+    or "default" outside a request, when there are no replicas, or when the
+    current user has written recently.
+    """
+    state = _state.get()
+    replicas = getattr(settings, "DATABASE_REPLICAS", [])
+    if state is None or state.pinned or state.wrote or not replicas:
+        return "default"
+    return random.choice(replicas)
+
+
+class PrimaryReplicaRouter:
+    """Send catalog and reporting reads to replicas and every write to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in REPLICA_MODELS:
+            return read_replica()
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        # Session saves don't change anything a replica read could return stale
+        if state is not None and model._meta.label_lower != "sessions.session":
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
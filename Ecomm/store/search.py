@@ -0,0 +1,71 @@
+# store/search.py
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+# Text search configuration used for both the stored vector and the queries
+SEARCH_CONFIG = "english"
+# Rank and similarity are floats; scaled to integers they compare exactly as keyset columns
+SCORE_SCALE = 1_000_000
+
+
+def is_postgres(queryset):
+    """True when the queryset runs against PostgreSQL (full-text search available)."""
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def product_search_vector():
+    """Weighted vector: name matches rank above description matches."""
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def refresh_search_vector(queryset):
+    """
+    Recompute the stored search vector for the given products in one UPDATE.
+    No-op on databases without full-text search.
+    """
+    if is_postgres(queryset):
+        queryset.update(search_vector=product_search_vector())
+
+
+def match_products(products, query):
+    """Filter `products` to those matching `query`, without relevance annotations."""
+    if not is_postgres(products):
+        return products.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    return products.filter(Q(search_vector=search_query) | Q(name__trigram_similar=query))
+
+
+def _score(expression):
+    return Cast(Round(expression * Value(SCORE_SCALE)), IntegerField())
+
+
+def search_products(products, query):
+    """
+    Filter and order `products` by relevance to `query`.
+
+    PostgreSQL: matches the GIN-indexed search vector or the trigram-indexed
+    name (so typos still match), ordered by rank then name similarity, both
+    scaled to integers so the order can be paged by keyset.
+    Other databases: case-insensitive substring match, name hits first.
+    """
+    products = match_products(products, query)
+    if not is_postgres(products):
+        return products.annotate(
+            rank=Case(
+                When(name__icontains=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by("-rank", "-id")
+
+    search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+    return products.annotate(
+        # Rows bulk-loaded without a vector still match on trigram; rank them 0
+        rank=_score(Coalesce(SearchRank(F("search_vector"), search_query), Value(0.0), output_field=FloatField())),
+        similarity=_score(TrigramSimilarity("name", query)),
+    ).order_by("-rank", "-similarity", "-id")
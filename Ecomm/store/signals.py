@@ -0,0 +1,32 @@
+# store/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cart import merge_session_cart
+from .catalog import bump_catalog_version
+from .middleware import time_queries
+from .models import Category, Product, ProductImage
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=ProductImage)
+def catalog_changed(sender, **kwargs):
+    """Saves and deletes (including through the admin) invalidate cached catalog fragments."""
+    bump_catalog_version()
+
+
+@receiver(user_logged_in)
+def adopt_session_cart(sender, request, user, **kwargs):
+    """Login and signup both go through auth.login(), which keeps the session's cart."""
+    if request is not None and hasattr(request, "session"):
+        merge_session_cart(request, user)
+
+
+@receiver(connection_created)
+def time_connection_queries(sender, connection, **kwargs):
+    """Time this connection's queries for ServerTimingMiddleware, whichever thread it belongs to."""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,248 @@
+# store/staticfiles.py
+import gzip
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.template.utils import get_app_template_dirs
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli for .br variants
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".map", ".txt", ".xml", ".html", ".ico"}
+# Hashed names never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=300"
+
+# Classes Bootstrap's JavaScript adds at runtime, so they never appear in our templates
+DEFAULT_PURGE_SAFELIST = {
+    "show", "showing", "hiding", "fade", "collapsing", "collapse", "active", "disabled",
+    "dropdown-menu-end", "dropdown-menu-start", "was-validated", "modal-open", "modal-backdrop",
+}
+
+
+# ------------------------------
+# UNUSED CSS STRIPPING
+# ------------------------------
+def _blocks(css):
+    """Split CSS into top-level (prelude, body) pairs; body is None for statements like @import."""
+    blocks, depth, start, prelude_end, quote = [], 0, 0, None, None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif css.startswith("/*", i):
+            i = css.find("*/", i + 2) + 1 or len(css)
+        elif char == "{":
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif char == ";" and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def _split_selectors(prelude):
+    """Split a selector list on top-level commas (not those inside :is(), :not(), ...)."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(prelude[start:i].strip())
+            start = i + 1
+    parts.append(prelude[start:].strip())
+    return parts
+
+
+_CLASS = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_COMMENT = re.compile(r"/\*(?!!).*?\*/", re.S)
+_LICENSE = re.compile(r"/\*!.*?\*/", re.S)
+_DECLARATION_GAP = re.compile(r":\s+")
+
+
+def _strip_comments(css):
+    return _COMMENT.sub("", css)
+
+
+def purge_css(css, used):
+    """
+    Drop style rules whose selectors all name a class outside `used`, keeping
+    at-rules' structure (empty @media blocks are dropped) and /*! license */ comments.
+    """
+    statements, out = [], []
+    for prelude, body in _blocks(_strip_comments(css)):
+        prelude = _LICENSE.sub("", prelude).strip()
+        if body is None:
+            statements.append(f"{prelude};")
+        elif prelude.startswith(("@media", "@supports", "@container", "@layer")):
+            inner = purge_css(body, used)
+            if inner:
+                out.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            # @font-face, @keyframes, @property, ...: keep as is
+            out.append(f"{prelude}{{{body}}}")
+        else:
+            selectors = [
+                selector for selector in _split_selectors(prelude)
+                if all(name in used for name in _CLASS.findall(re.sub(r"\([^)]*\)", "", selector)))
+            ]
+            if selectors:
+                body = _DECLARATION_GAP.sub(":", body)
+                out.append(f"{','.join(selectors)}{{{body}}}")
+    # @charset has to stay first; license comments follow it
+    css = "".join(statements) + "".join(_LICENSE.findall(css)) + "".join(out)
+    # Whitespace collapsing, conservative enough for selectors and calc()
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,])\s*", r"\1", css)
+    return css.replace(";}", "}")
+
+
+def template_tokens():
+    """Every word-like token in the project's templates (class names, JS class toggles, ...)."""
+    dirs = [Path(d) for engine in settings.TEMPLATES for d in engine.get("DIRS", [])]
+    dirs += [Path(d) for d in get_app_template_dirs("templates")]
+    tokens = set()
+    for directory in dirs:
+        for path in directory.rglob("*.html"):
+            tokens.update(re.findall(r"[\w-]+", path.read_text(encoding="utf-8")))
+    return tokens
+
+
+# ------------------------------
+# STORAGE
+# ------------------------------
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    `collectstatic` storage that writes content-hashed copies plus a manifest
+    (ManifestStaticFilesStorage), trims the CSS files listed in STATIC_PURGE_CSS
+    to the selectors our templates use, and stores .gz (and, with the brotli
+    package installed, .br) variants next to each text asset.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = self.purge(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in {*self.hashed_files.values(), *paths}:
+                self.compress(name)
+
+    def purge(self, paths):
+        purge = getattr(settings, "STATIC_PURGE_CSS", [])
+        if not purge:
+            return paths
+        used = template_tokens() | DEFAULT_PURGE_SAFELIST | set(getattr(settings, "STATIC_PURGE_SAFELIST", []))
+        paths = dict(paths)
+        for name in purge:
+            if name not in paths:
+                continue
+            source_storage, source_path = paths[name]
+            with source_storage.open(source_path) as f:
+                css = f.read().decode("utf-8")
+            self.delete(name)
+            self._save(name, ContentFile(purge_css(css, used).encode()))
+            # Hash the trimmed copy, not the original
+            paths[name] = (self, name)
+        return paths
+
+    def compress(self, name):
+        if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+            return
+        with self.open(name) as f:
+            content = f.read()
+        variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            # Vendored bundles point at source maps we don't ship; leave those references alone
+            if name.split("?")[0].endswith(".map"):
+                return name
+            raise
+
+    def stored_name(self, name):
+        # Before the first collectstatic (development, tests) there is no manifest: use plain names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+# ------------------------------
+# SERVING
+# ------------------------------
+@lru_cache(maxsize=1)
+def _hashed_names():
+    return frozenset(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serve a collected static file, preferring a precompressed variant the client
+    accepts. Hashed names are cached as immutable; the rest only briefly.
+    Used when DEBUG is off (see ecommerce/urls.py).
+    """
+    try:
+        full_path = staticfiles_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    accepted = _accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    encoding = None
+    for suffix, coding in ((".br", "br"), (".gz", "gzip")):
+        if coding in accepted and os.path.isfile(full_path + suffix):
+            full_path, encoding = full_path + suffix, coding
+            break
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if path in _hashed_names() else MUTABLE_CACHE_CONTROL
+    return response
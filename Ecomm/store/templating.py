@@ -0,0 +1,26 @@
+# store/templating.py
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .middleware import time_render
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        return time_render(super().render, context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, with each top-level render added to the
+    request's Server-Timing template time (store.middleware).
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -1,3 +1,1129 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.timezone import now
+from PIL import Image
+
+from .models import (
+    PAYMENT_SETTLE_TIME, Category, Checkpoint, CoPurchase, DailySales, Order, OrderItem, Product, ProductImage,
+    RelatedProduct,
+)
+from .cart import MAX_LINE_QUANTITY, add_lines_to_order, add_to_user_cart, change_cart_line
+from .facets import product_facets
+from .middleware import ServerTimingMiddleware
+from .routers import PrimaryReplicaRouter, RoutingState, _state
+from .search import search_products
+from .staticfiles import _hashed_names, purge_css
+from .warmup import warmup
+
+
+class ProductSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Audio")
+        cls.headphones = Product.objects.create(
+            name="Wireless Headphones", description="Noise cancelling", price=Decimal("199.00"),
+            category=cls.category,
+        )
+        cls.speaker = Product.objects.create(
+            name="Bluetooth Speaker", description="Pairs with wireless headphones", price=Decimal("59.00"),
+            category=cls.category,
+        )
+        cls.mouse = Product.objects.create(name="Mouse", description="Ergonomic", price=Decimal("25.00"))
+
+    def test_matches_name_and_description(self):
+        results = list(search_products(Product.objects.all(), "headphones"))
+        self.assertEqual(set(results), {self.headphones, self.speaker})
+
+    def test_name_matches_rank_first(self):
+        results = list(search_products(Product.objects.all(), "headphones"))
+        self.assertEqual(results[0], self.headphones)
+
+    def test_home_uses_search(self):
+        response = self.client.get(reverse("home"), {"q": "ergonomic"})
+        self.assertEqual(list(response.context["products"]), [self.mouse])
+
+
+class ProductPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal(i % 7 + 1)) for i in range(30)
+        )
+
+    def test_keyset_pages_cover_listing_once(self):
+        seen = []
+        cursor = None
+        for _ in range(10):
+            response = self.client.get(reverse("product_list"), {"sort": "price_asc", "cursor": cursor or ""})
+            data = response.json()
+            seen += [p["id"] for p in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(set(seen), {p.id for p in self.products})
+        prices = [Product.objects.get(id=i).price for i in seen]
+        self.assertEqual(prices, sorted(prices))
+
+    def test_home_renders_first_page_with_next_cursor(self):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(len(response.context["products"]), 24)
+        self.assertTrue(response.context["next_cursor"])
+
+        response = self.client.get(reverse("home"), {"cursor": response.context["next_cursor"]})
+        self.assertEqual(len(response.context["products"]), 6)
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse("product_list"), {"cursor": "garbage"})
+        self.assertEqual(len(response.json()["results"]), 24)
+
+    def test_cursor_from_another_sort_falls_back_to_first_page(self):
+        cursor = self.client.get(reverse("product_list"), {"sort": "newest"}).json()["next_cursor"]
+
+        response = self.client.get(reverse("product_list"), {"sort": "price_asc", "cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+        first_page = self.client.get(reverse("product_list"), {"sort": "price_asc"}).json()["results"]
+        self.assertEqual(response.json()["results"], first_page)
+
+        response = self.client.get(reverse("home"), {"sort": "price_asc", "cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["products"]), 24)
+
+
+class CartQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.order = Order.objects.create(user=cls.user)
+        products = Product.objects.bulk_create(
+            Product(name=f"Item {i}", slug=f"item-{i}", price=Decimal("2.50")) for i in range(40)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=cls.order, product=p, price=p.price, quantity=2) for p in products
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cart_query_count_is_constant(self):
+        self.client.get(reverse("cart"))  # caches the badge count in the session
+        # session, user, cart order + items, recommendations
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("cart"))
+        self.assertContains(response, '<span id="cart-total">200.00</span>')
+
+    def test_checkout_query_count_is_constant(self):
+        self.client.get(reverse("cart"))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("checkout"))
+        self.assertContains(response, "$200.00")
+
+
+class CartBadgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_badge_count_is_cached_in_session(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.product, price=Decimal("10.00"))
+
+        response = self.client.get(reverse("order_success"))
+        self.assertEqual(response.context["cart_count"], 1)
+
+        # Cached: only the session and user lookups remain
+        with self.assertNumQueries(2):
+            self.client.get(reverse("order_success"))
+
+    def test_add_to_cart_invalidates_badge(self):
+        self.assertEqual(self.client.get(reverse("order_success")).context["cart_count"], 0)
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        self.assertEqual(self.client.get(reverse("order_success")).context["cart_count"], 1)
+
+    def test_anonymous_pages_skip_cart_queries(self):
+        self.client.logout()
+        with self.assertNumQueries(0):
+            self.client.get(reverse("login"))
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.audio = Category.objects.create(name="Audio")
+        cls.video = Category.objects.create(name="Video")
+        cls.speaker = Product.objects.create(name="Speaker", price=Decimal("50.00"), category=cls.audio, stock=100)
+        cls.tv = Product.objects.create(name="TV", price=Decimal("300.00"), category=cls.video, stock=100)
+
+    def checkout(self, *lines):
+        self.client.force_login(self.staff)
+        for product, quantity in lines:
+            self.client.post(reverse("add_to_cart", args=[product.id]), {"quantity": quantity})
+        # The rollup is updated once checkout commits
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post(reverse("checkout"), {"shipping_address": "Somewhere"})
+        return callbacks
+
+    def test_checkout_updates_rollup_with_quantity(self):
+        self.assertEqual(len(self.checkout((self.speaker, 3), (self.tv, 1))), 1)
+        total = DailySales.objects.get(category__isnull=True)
+        self.assertEqual((total.revenue, total.orders, total.units), (Decimal("450.00"), 1, 4))
+        audio = DailySales.objects.get(category=self.audio)
+        self.assertEqual((audio.revenue, audio.orders, audio.units), (Decimal("150.00"), 1, 3))
+
+    def test_command_rebuild_matches_live_updates(self):
+        self.checkout((self.speaker, 2))
+        self.checkout((self.speaker, 1), (self.tv, 2))
+        live = sorted(DailySales.objects.values_list("category", "revenue", "orders", "units"), key=str)
+
+        DailySales.objects.all().delete()
+        call_command("rollup_sales", stdout=StringIO())
+        rebuilt = sorted(DailySales.objects.values_list("category", "revenue", "orders", "units"), key=str)
+        self.assertEqual(live, rebuilt)
+
+    def test_command_picks_up_orders_committed_after_last_run(self):
+        call_command("rollup_sales", stdout=StringIO())
+        # Stamped paid_at before that run, committed (without the live update) after it
+        order = Order.objects.create(paid=True, paid_at=Checkpoint.objects.get().timestamp - timedelta(minutes=1))
+        OrderItem.objects.create(order=order, product=self.tv, price=self.tv.price, quantity=1)
+
+        call_command("rollup_sales", stdout=StringIO())
+        call_command("rollup_sales", stdout=StringIO())
+        total = DailySales.objects.get(category__isnull=True)
+        self.assertEqual((total.revenue, total.orders, total.units), (Decimal("300.00"), 1, 1))
+
+    def test_dashboard_reads_rollup(self):
+        self.checkout((self.speaker, 2), (self.tv, 1))
+        response = self.client.get(reverse("dashboard"), {"status": "paid", "category": "Audio", "days": 7})
+        self.assertEqual(response.context["total_sales"], Decimal("100.00"))
+        self.assertEqual(response.context["total_orders"], 1)
+
+
+class DashboardOrderTableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        for i in range(60):
+            # Unpaid orders are guest carts: a user can only have one
+            order = Order.objects.create(user=cls.staff if i % 2 else None, paid=bool(i % 2))
+            OrderItem.objects.create(order=order, product=cls.product, price=cls.product.price, quantity=i % 3 + 1)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_order_table_is_paginated_in_one_query(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(len(response.context["orders"]), 50)
+        self.assertTrue(response.context["next_cursor"])
+        with self.assertNumQueries(0):
+            rows = [(o.user and o.user.username, o.lines) for o in response.context["orders"]]
+        self.assertEqual(rows[0], ("staff", 1))
+
+    def test_export_streams_filtered_orders(self):
+        response = self.client.get(reverse("export_orders"), {"status": "paid"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,user,paid,created_at,paid_at,lines,units,total")
+        self.assertEqual(len(lines), 31)
+
+    def test_export_ndjson(self):
+        response = self.client.get(reverse("export_orders"), {"format": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 60)
+        self.assertEqual(json.loads(lines[0])["user"], "staff")
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse("export_orders"), {"format": "ndjson"})
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 60)
+
+    def test_export_requires_staff(self):
+        self.client.force_login(User.objects.create_user("shopper"))
+        response = self.client.get(reverse("export_orders"))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageDerivativeTests(TestCase):
+    def upload(self, name="photo.jpg", size=(1200, 800)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "orange").save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def test_saving_product_image_builds_derivatives(self):
+        product = Product.objects.create(name="Camera", price=Decimal("99.00"), image=self.upload())
+        product.refresh_from_db()
+        self.assertEqual(sorted(product.image_derivatives["webp"]), ["160", "320", "640"])
+        self.assertEqual(product.image_derivatives["source"], product.image.name)
+        self.assertTrue(product.image_placeholder().startswith("data:image/jpeg;base64,"))
+        self.assertLess(len(product.image_placeholder()), 1000)
+        self.assertRegex(product.image_color(), r"^#f[0-9a-f]{5}$")
+
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "-320.webp 320w")
+        self.assertContains(response, "-640.jpeg 640w")
+        self.assertContains(response, product.image_placeholder())
+
+    def test_products_without_image_get_a_local_placeholder(self):
+        product = Product.objects.create(name="Desk Lamp", price=Decimal("30.00"))
+        image = product.get_or_fetch_image()
+        self.assertTrue(image.startswith("data:image/svg+xml,"))
+        self.assertIn("DL", image)
+        self.assertEqual(image, Product(name="Desk Lamp").get_or_fetch_image())
+        self.assertNotEqual(image, Product(name="Desk Chair").get_or_fetch_image())
+        self.assertNotContains(self.client.get(reverse("home")), "unsplash")
+
+    def test_small_images_are_not_upscaled(self):
+        image = ProductImage.objects.create(
+            product=Product.objects.create(name="Pin", price=Decimal("1.00")),
+            image=self.upload("pin.jpg", (100, 100)),
+        )
+        self.assertEqual(list(image.image_derivatives["jpeg"]), ["100"])
+
+    def test_backfill_command(self):
+        product = Product.objects.create(name="Camera", price=Decimal("99.00"), image=self.upload())
+        Product.objects.filter(pk=product.pk).update(image_derivatives={})
+        call_command("build_image_derivatives", "--workers=1", stdout=StringIO())
+        product.refresh_from_db()
+        self.assertEqual(sorted(product.image_derivatives["jpeg"]), ["160", "320", "640"])
+
+        # Derivatives from before placeholders existed are rebuilt too
+        del product.image_derivatives["placeholder"]
+        Product.objects.filter(pk=product.pk).update(image_derivatives=product.image_derivatives)
+        call_command("build_image_derivatives", "--workers=1", stdout=StringIO())
+        product.refresh_from_db()
+        self.assertIn("placeholder", product.image_derivatives)
+
+
+class CatalogFragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Audio")
+        cls.product = Product.objects.create(name="Speaker", price=Decimal("50.00"), category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_repeat_visit_runs_no_queries(self):
+        self.client.get(reverse("home"), {"category": [self.category.id], "q": "speaker"})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("home"), {"q": " speaker ", "category": [self.category.id]})
+        self.assertContains(response, "Speaker")
+
+    def test_catalog_changes_bump_version(self):
+        self.client.get(reverse("home"))
+        self.product.name = "Loudspeaker"
+        self.product.save()
+        self.assertContains(self.client.get(reverse("home")), "Loudspeaker")
+
+        self.category.delete()
+        response = self.client.get(reverse("home"))
+        self.assertNotContains(response, "Audio")
+
+    def test_signed_in_grid_is_not_shared(self):
+        self.client.get(reverse("home"))
+        self.client.force_login(User.objects.create_user("shopper"))
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, 'name="quantity"')
+        self.assertContains(response, "csrfmiddlewaretoken")
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name="Speaker", price=Decimal("50.00"), stock=5)
+        cls.user = User.objects.create_user("shopper")
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, headers={"if-none-match": response["ETag"]})
+
+    def test_unchanged_home_is_not_modified(self):
+        url = reverse("home")
+        response = self.client.get(url)
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, headers={"if-modified-since": response["Last-Modified"]}).status_code, 304
+        )
+
+        self.product.price = Decimal("45.00")
+        self.product.save()
+        self.assertContains(self.revalidate(url, response), "45.00")
+
+    def test_signed_in_home_changes_with_the_cart(self):
+        self.client.force_login(self.user)
+        url = reverse("home")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_manage_orders_changes_with_orders_and_lines(self):
+        self.client.force_login(self.user)
+        url = reverse("manage_orders")
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        response = self.client.get(url)
+        with self.assertNumQueries(3):  # session, user, order state
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+
+        line = OrderItem.objects.get(order__user=self.user)
+        self.client.post(reverse("remove_from_cart", args=[line.id]))
+        self.assertEqual(self.revalidate(url, changed).status_code, 200)
+
+
+class ProductFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.audio = Category.objects.create(name="Audio")
+        cls.video = Category.objects.create(name="Video")
+        for name, price, category in [
+            ("Earbuds", "20.00", cls.audio), ("Speaker", "60.00", cls.audio), ("Amp", "300.00", cls.audio),
+            ("Webcam", "45.00", cls.video), ("Projector", "600.00", cls.video),
+        ]:
+            Product.objects.create(name=name, price=Decimal(price), category=category)
+
+    def facets(self, categories=(), min_price="", max_price=""):
+        return product_facets(Product.objects.all(), [str(c.id) for c in categories], min_price, max_price)
+
+    def test_counts_without_filters(self):
+        facets = self.facets()
+        self.assertEqual([(c["name"], c["count"]) for c in facets["categories"]], [("Audio", 3), ("Video", 2)])
+        self.assertEqual([b["count"] for b in facets["price_buckets"]], [1, 1, 1, 0, 1, 1])
+
+    def test_each_facet_respects_the_other(self):
+        facets = self.facets(categories=[self.video], min_price="25", max_price="49.99")
+        # Category counts honour the price range, not the category selection
+        self.assertEqual([(c["name"], c["count"]) for c in facets["categories"]], [("Video", 1)])
+        # Bucket counts honour the category selection, not the price range
+        self.assertEqual([b["count"] for b in facets["price_buckets"]], [0, 1, 0, 0, 0, 1])
+        self.assertTrue(facets["price_buckets"][1]["selected"])
+
+    def test_facets_are_one_query(self):
+        with self.assertNumQueries(1):
+            self.facets(categories=[self.audio], min_price="50")
+
+
+class CartMutationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_repeated_adds_accumulate_on_one_line(self):
+        for quantity in (1, 2, 3):
+            self.client.post(reverse("add_to_cart", args=[self.product.id]), {"quantity": quantity})
+        item = OrderItem.objects.get()
+        self.assertEqual((item.quantity, item.price), (6, Decimal("10.00")))
+        self.assertEqual(Order.objects.filter(user=self.user, paid=False).count(), 1)
+
+    def test_add_to_cart_is_few_queries(self):
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        # session, user, order lookup, upsert, order totals
+        with self.assertNumQueries(5):
+            self.client.post(reverse("add_to_cart", args=[self.product.id]))
+
+    def test_add_unknown_product_is_404(self):
+        response = self.client.post(reverse("add_to_cart", args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_second_unpaid_order_is_rejected(self):
+        Order.objects.create(user=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(user=self.user)
+
+    def test_update_cart_increase_decrease_and_remove(self):
+        self.client.post(reverse("add_to_cart", args=[self.product.id]))
+        item = OrderItem.objects.get()
+        url = reverse("update_cart", args=[item.id])
+
+        self.client.post(url, {"action": "increase"})
+        self.assertEqual(OrderItem.objects.get().quantity, 2)
+        self.client.post(url, {"action": "decrease"})
+        self.client.post(url, {"action": "decrease"})
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(self.client.post(url, {"action": "increase"}).status_code, 404)
+
+    def test_json_mutations_return_cart_summary(self):
+        other = Product.objects.create(name="Desk", price=Decimal("90.00"))
+        self.client.post(reverse("add_to_cart", args=[other.id]))
+        response = self.client.post(reverse("add_to_cart", args=[self.product.id]), {"quantity": 2},
+                                    headers={"accept": "application/json"})
+        self.assertEqual(response.json(),
+                         {"quantity": 2, "line_total": "20.00", "cart_total": "110.00", "cart_count": 2})
+
+        item = OrderItem.objects.get(product=self.product)
+        response = self.client.post(reverse("update_cart", args=[item.id]), {"action": "increase"},
+                                    headers={"accept": "application/json"})
+        self.assertEqual(response.json()["line_total"], "30.00")
+
+        response = self.client.post(reverse("remove_from_cart", args=[item.id]),
+                                    headers={"accept": "application/json"})
+        self.assertEqual(response.json(),
+                         {"quantity": 0, "line_total": "0.00", "cart_total": "90.00", "cart_count": 1})
+        # The badge count came with the response, so the next page needs no count query
+        self.assertEqual(self.client.session["cart_count"], 1)
+
+
+class OrderTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.lamp = Product.objects.create(name="Lamp", price=Decimal("10.00"), stock=10)
+        cls.desk = Product.objects.create(name="Desk", price=Decimal("90.00"), stock=10)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def totals(self):
+        order = Order.objects.get(user=self.user)
+        return order.total_amount, order.item_count
+
+    def test_totals_follow_cart_mutations_and_freeze_at_checkout(self):
+        self.client.post(reverse("add_to_cart", args=[self.lamp.id]), {"quantity": 2})
+        self.client.post(reverse("add_to_cart", args=[self.desk.id]))
+        self.assertEqual(self.totals(), (Decimal("110.00"), 3))
+
+        lamp = OrderItem.objects.get(product=self.lamp)
+        self.client.post(reverse("update_cart", args=[lamp.id]), {"action": "decrease"})
+        self.assertEqual(self.totals(), (Decimal("100.00"), 2))
+        self.client.post(reverse("remove_from_cart", args=[lamp.id]))
+        self.assertEqual(self.totals(), (Decimal("90.00"), 1))
+
+        self.client.post(reverse("checkout"), {"shipping_address": "Somewhere"})
+        OrderItem.objects.update(quantity=5)
+        self.assertEqual(self.totals(), (Decimal("90.00"), 1))
+
+    def test_lines_are_never_added_to_a_paid_order(self):
+        self.client.post(reverse("add_to_cart", args=[self.desk.id]))
+        self.client.post(reverse("checkout"), {"shipping_address": "Somewhere"})
+        paid = Order.objects.get(user=self.user)
+
+        # An add that looked the cart up just before checkout paid it
+        self.assertEqual(add_lines_to_order(paid, {self.lamp.id: 2}), 0)
+        self.assertEqual(self.totals(), (Decimal("90.00"), 1))
+        self.assertEqual(paid.items.count(), 1)
+
+        self.assertEqual(add_to_user_cart(self.user, {self.lamp.id: 2}), 1)
+        cart = Order.objects.get(user=self.user, paid=False)
+        self.assertEqual((cart.total_amount, cart.item_count), (Decimal("20.00"), 2))
+
+    def test_line_changes_waiting_on_checkout_change_nothing(self):
+        self.client.post(reverse("add_to_cart", args=[self.desk.id]))
+        line = OrderItem.objects.get()
+        # What a cart action that queued behind checkout's lock finds once it commits
+        self.client.post(reverse("checkout"), {"shipping_address": "Somewhere"})
+        for action in ("increase", "decrease", "remove"):
+            self.assertFalse(change_cart_line(self.user, line.id, action))
+        self.assertEqual(OrderItem.objects.get().quantity, 1)
+        self.assertEqual(self.totals(), (Decimal("90.00"), 1))
+        self.assertEqual(self.client.post(reverse("update_cart", args=[line.id]), {"action": "increase"}).status_code, 404)
+
+    def test_backfill_sums_existing_lines(self):
+        order = Order.objects.create(user=self.user, paid=True)
+        empty = Order.objects.create(paid=True, total_amount=Decimal("5.00"), item_count=1)
+        OrderItem.objects.create(order=order, product=self.lamp, price=Decimal("10.00"), quantity=3)
+        OrderItem.objects.create(order=order, product=self.desk, price=Decimal("80.00"), quantity=1)
+        import_module("store.migrations.0012_order_totals").backfill_totals(apps, None)
+        self.assertEqual(Order.objects.values_list("pk", "total_amount", "item_count").get(pk=order.pk),
+                         (order.pk, Decimal("110.00"), 4))
+        self.assertEqual(Order.objects.values_list("total_amount", "item_count").get(pk=empty.pk), (0, 0))
+
+    def test_order_history_is_paginated_with_constant_queries(self):
+        for i in range(25):
+            order = Order.objects.create(user=self.user, paid=True, total_amount=Decimal("10.00"), item_count=1)
+            OrderItem.objects.create(order=order, product=self.lamp, price=Decimal("10.00"), quantity=1)
+        self.client.get(reverse("manage_orders"))  # caches the badge count in the session
+        # session, user, conditional GET state, orders, lines with products
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("manage_orders"))
+        self.assertEqual(len(response.context["orders"]), 20)
+        self.assertContains(response, "Total: $10.00")
+
+        response = self.client.get(reverse("manage_orders"), {"cursor": response.context["next_cursor"]})
+        self.assertEqual(len(response.context["orders"]), 5)
+        self.assertIsNone(response.context["next_cursor"])
+
+
+class SessionCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamp = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        cls.desk = Product.objects.create(name="Desk", price=Decimal("100.00"))
+        cls.user = User.objects.create_user("shopper", password="secret")
+
+    def add(self, product, quantity=1, **extra):
+        return self.client.post(reverse("add_to_cart", args=[product.id]), {"quantity": quantity}, **extra)
+
+    def test_anonymous_cart_lives_in_the_session(self):
+        self.assertRedirects(self.add(self.lamp, 2), reverse("cart"))
+        self.add(self.desk)
+        self.assertFalse(Order.objects.exists())
+
+        response = self.client.get(reverse("cart"))
+        self.assertContains(response, '<span id="cart-total">120.00</span>')
+        self.assertEqual(response.context["cart_count"], 2)
+
+        data = self.client.post(
+            reverse("update_cart", args=[self.lamp.id]), {"action": "decrease"}, headers={"accept": "application/json"}
+        ).json()
+        self.assertEqual(data, {"quantity": 1, "line_total": "10.00", "cart_total": "110.00", "cart_count": 2})
+        data = self.client.post(reverse("remove_from_cart", args=[self.desk.id]), headers={"accept": "application/json"}).json()
+        self.assertEqual(data, {"quantity": 0, "line_total": "0.00", "cart_total": "10.00", "cart_count": 1})
+        self.assertEqual(self.client.post(reverse("remove_from_cart", args=[self.desk.id])).status_code, 404)
+        self.assertEqual(self.add(Product(pk=999999)).status_code, 404)
+
+    def test_login_merges_the_session_cart_in_one_upsert(self):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.lamp, price=self.lamp.price, quantity=1)
+        self.add(self.lamp, 2)
+        self.add(self.desk)
+
+        response = self.client.post(reverse("login"), {"username": "shopper", "password": "secret"})
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        lines = dict(OrderItem.objects.filter(order=order).values_list("product__name", "quantity"))
+        self.assertEqual(lines, {"Lamp": 3, "Desk": 1})
+        self.assertNotIn("cart", self.client.session)
+
+    def test_huge_quantities_are_capped_through_login(self):
+        self.add(self.lamp, 10 ** 12)
+        self.add(self.lamp, 10 ** 12)
+        # A session written before the cap
+        session = self.client.session
+        session["cart"][str(self.desk.id)] = 10 ** 12
+        session.save()
+
+        response = self.client.post(reverse("login"), {"username": "shopper", "password": "secret"})
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        self.add(self.lamp, 10 ** 12)
+        lines = dict(OrderItem.objects.values_list("product__name", "quantity"))
+        self.assertEqual(lines, {"Lamp": MAX_LINE_QUANTITY, "Desk": MAX_LINE_QUANTITY})
+
+    def test_signup_merges_the_session_cart(self):
+        self.add(self.desk, 3)
+        self.client.post(reverse("signup"), {"username": "newbie", "password1": "Xk39!pq-lamp", "password2": "Xk39!pq-lamp"})
+        item = OrderItem.objects.get(order__user__username="newbie", order__paid=False)
+        self.assertEqual((item.product, item.quantity), (self.desk, 3))
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions_write_no_rows(self):
+        self.add(self.lamp, 2)
+        self.assertContains(self.client.get(reverse("cart")), "Lamp")
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(Order.objects.exists())
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamp, cls.bulb, cls.shade, cls.desk = (
+            Product.objects.create(name=name, price=Decimal("10.00")) for name in ("Lamp", "Bulb", "Shade", "Desk")
+        )
+        cls.user = User.objects.create_user("shopper")
+
+    def paid_order(self, *products):
+        order = Order.objects.create(paid=True, paid_at=now())
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+        return order
+
+    def build(self, *args, settle=0):
+        call_command("build_recommendations", "--min-orders", "1", "--settle", str(settle), *args, stdout=StringIO())
+
+    def related(self, product):
+        return list(RelatedProduct.objects.filter(product=product).order_by("rank").values_list("related__name", flat=True))
+
+    def test_pairs_are_counted_incrementally(self):
+        self.paid_order(self.lamp, self.bulb)
+        self.paid_order(self.lamp, self.bulb, self.shade)
+        self.build()
+        self.assertEqual(CoPurchase.objects.get(product=self.lamp, other=self.bulb).orders, 2)
+        self.assertEqual(CoPurchase.objects.get(product=self.lamp, other=self.lamp).orders, 2)
+        self.assertEqual(self.related(self.lamp), ["Bulb", "Shade"])
+
+        # Only the new order is folded in; a rerun with nothing new changes nothing
+        self.paid_order(self.desk, self.shade)
+        self.build()
+        self.build()
+        self.assertEqual(CoPurchase.objects.get(product=self.lamp, other=self.bulb).orders, 2)
+        self.assertEqual(CoPurchase.objects.get(product=self.shade, other=self.shade).orders, 2)
+        self.assertEqual(self.related(self.desk), ["Shade"])
+
+        counts = set(CoPurchase.objects.values_list("product", "other", "orders"))
+        self.build("--full")
+        self.assertEqual(set(CoPurchase.objects.values_list("product", "other", "orders")), counts)
+
+    def test_orders_committing_after_a_run_are_counted_once(self):
+        settle = int(PAYMENT_SETTLE_TIME.total_seconds())
+        self.paid_order(self.lamp, self.bulb)
+        self.build(settle=settle)
+        self.assertFalse(CoPurchase.objects.exists())
+
+        # Stamped paid_at before that run read the orders, committed after it
+        late = self.paid_order(self.lamp, self.shade)
+        late.paid_at = Checkpoint.objects.get().timestamp + PAYMENT_SETTLE_TIME - timedelta(seconds=1)
+        late.save()
+        # The clock moves on past the settle time
+        Order.objects.update(paid_at=F("paid_at") - PAYMENT_SETTLE_TIME)
+        Checkpoint.objects.update(timestamp=F("timestamp") - PAYMENT_SETTLE_TIME)
+
+        self.build(settle=settle)
+        self.build(settle=settle)
+        self.assertEqual(CoPurchase.objects.get(product=self.lamp, other=self.lamp).orders, 2)
+        self.assertEqual(set(self.related(self.lamp)), {"Bulb", "Shade"})
+
+    def test_cart_shows_related_products(self):
+        self.paid_order(self.lamp, self.bulb)
+        self.build()
+        self.client.force_login(self.user)
+        self.client.post(reverse("add_to_cart", args=[self.lamp.id]))
+        response = self.client.get(reverse("cart"))
+        self.assertEqual(response.context["recommendations"], [self.bulb])
+        self.assertContains(response, "Frequently bought together")
+
+
+class CheckoutStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.lamp = Product.objects.create(name="Lamp", price=Decimal("10.00"), stock=5)
+        cls.desk = Product.objects.create(name="Desk", price=Decimal("90.00"), stock=1)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add(self, product, quantity):
+        self.client.post(reverse("add_to_cart", args=[product.id]), {"quantity": quantity})
+
+    def checkout(self):
+        return self.client.post(reverse("checkout"), {"shipping_address": "Somewhere"})
+
+    def test_checkout_decrements_stock(self):
+        self.add(self.lamp, 3)
+        self.add(self.desk, 1)
+        self.assertRedirects(self.checkout(), reverse("order_success"))
+        self.assertEqual(Product.objects.get(pk=self.lamp.pk).stock, 2)
+        self.assertEqual(Product.objects.get(pk=self.desk.pk).stock, 0)
+        self.assertTrue(Order.objects.get(user=self.user).paid)
+
+    def test_shortage_rolls_back_every_line(self):
+        self.add(self.lamp, 3)
+        self.add(self.desk, 2)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([(item.product, available) for item, available in response.context["shortages"]],
+                         [(self.desk, 1)])
+        self.assertContains(response, "only 1 left", status_code=409)
+        self.assertEqual(Product.objects.get(pk=self.lamp.pk).stock, 5)
+        self.assertFalse(Order.objects.get(user=self.user).paid)
+
+    def test_stock_taken_by_another_order_is_reported(self):
+        self.add(self.desk, 1)
+        Product.objects.filter(pk=self.desk.pk).update(stock=0)
+        self.assertContains(self.checkout(), "sold out", status_code=409)
+
+
+class ImportCatalogTests(TestCase):
+    def run_import(self, content, suffix=".csv"):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as f:
+            f.write(content)
+        out, err = StringIO(), StringIO()
+        call_command("import_catalog", f.name, "--batch-size", "2", stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_creates_then_skips_unchanged_rows(self):
+        feed = (
+            "name,description,price,stock,category\n"
+            "Lamp,Warm light,10,5,Lighting\n"
+            "Desk,Oak,90.5,2,Furniture\n"
+            "Chair,,45,1,Furniture\n"
+        )
+        out, _ = self.run_import(feed)
+        self.assertIn("Created 3, updated 0, unchanged 0", out)
+        self.assertEqual(Category.objects.count(), 2)
+        desk = Product.objects.get(slug="desk")
+        self.assertEqual((desk.price, desk.stock, desk.category.name), (Decimal("90.50"), 2, "Furniture"))
+
+        out, _ = self.run_import(feed.replace("Oak,90.5,2", "Oak,80,2"))
+        self.assertIn("Created 0, updated 1, unchanged 2", out)
+        self.assertEqual(Product.objects.get(slug="desk").price, Decimal("80.00"))
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_jsonl_slug_collision_and_invalid_rows(self):
+        Product.objects.create(name="Lamp!", price=Decimal("1.00"))  # already owns slug "lamp"
+        feed = "\n".join([
+            json.dumps({"name": "Lamp", "price": "12.00"}),
+            json.dumps({"name": "Broken", "price": "n/a"}),
+            json.dumps({"slug": "lamp", "name": "Lamp!", "price": "2.00"}),
+        ])
+        out, err = self.run_import(feed, suffix=".jsonl")
+        self.assertIn("Created 1, updated 1, unchanged 0, invalid 1", out)
+        self.assertIn("Line 2", err)
+        self.assertEqual(Product.objects.get(slug="lamp-2").name, "Lamp")
+        self.assertEqual(Product.objects.get(slug="lamp").price, Decimal("2.00"))
+
+    def test_jsonl_malformed_lines_are_counted_not_fatal(self):
+        feed = "\n".join([
+            '{"name": "Lamp", "price": "12.00"',
+            json.dumps(["Desk", "90.00"]),
+            json.dumps({"name": "Chair", "price": "45.00"}),
+        ])
+        out, err = self.run_import(feed, suffix=".jsonl")
+        self.assertIn("Created 1, updated 0, unchanged 0, invalid 2", out)
+        self.assertIn("Line 1", err)
+        self.assertIn("Line 2", err)
+        self.assertTrue(Product.objects.filter(slug="chair").exists())
+
+
+class AsyncViewTests(TestCase):
+    """Served through AsyncClient, any database access left to the templates would raise."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.lamp = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+
+    async def test_storefront_pages_render_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse("add_to_cart", args=[self.lamp.id]), {"quantity": 2})
+        self.assertRedirects(response, reverse("cart"), fetch_redirect_response=False)
+
+        for name in ("home", "cart", "manage_orders", "dashboard"):
+            with self.subTest(name):
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context["cart_count"], 1)
+        self.assertContains(response, "shopper")  # the open order, with its user joined in
+
+        item = await OrderItem.objects.aget()
+        await self.async_client.post(reverse("update_cart", args=[item.id]), {"action": "increase"})
+        self.assertEqual((await OrderItem.objects.aget()).quantity, 3)
+        await self.async_client.post(reverse("remove_from_cart", args=[item.id]))
+        self.assertFalse(await OrderItem.objects.aexists())
+
+
+class BenchHarnessTests(TestCase):
+    def test_seed_and_run_bench(self):
+        call_command("seed_bench", "--categories", "3", "--products", "40", "--users", "5",
+                     "--orders", "20", "--items", "60", stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Order.objects.filter(paid=False).count(), 1)
+        self.assertGreater(OrderItem.objects.count(), 20)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = f"{tmp}/bench.json"
+            call_command("run_bench", "-n", "2", "--warmup", "1", "-o", output,
+                         "--only", "home_search", "cart", "checkout_post", "dashboard", stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual({name: r["status"] for name, r in report["scenarios"].items()},
+                         {"home_search": 200, "cart": 200, "checkout_post": 302, "dashboard": 200})
+        self.assertEqual(report["scenarios"]["cart"]["queries"], 5)
+        # Benchmark writes are rolled back
+        self.assertEqual(Order.objects.filter(paid=True).count(), 19)
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="secret")
+        cls.lamp = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+
+    def test_header_reports_queries_and_template_time(self):
+        self.client.force_login(self.user)
+        timing = self.client.get(reverse("cart")).headers["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, view;dur=[\d.]+$')
+        self.assertNotIn("tpl;dur=0.0,", timing)
+
+    async def test_async_views_report_queries_from_their_worker_threads(self):
+        cache.clear()
+        for name in ("home", "product_list"):
+            with self.subTest(name):
+                timing = (await self.async_client.get(reverse(name))).headers["Server-Timing"]
+                self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+    @override_settings(SERVER_TIMING_BUDGETS={"home": 0})
+    def test_over_budget_requests_are_logged(self):
+        with self.assertLogs("store.middleware", "WARNING") as logs:
+            self.client.get(reverse("home"))
+        self.assertIn("over its 0ms budget", logs.output[0])
+
+    def test_repeated_queries_are_logged(self):
+        def view(request):
+            for order in Order.objects.all():
+                order.items.count()  # N+1
+            for _ in range(3):
+                Product.objects.filter(pk=self.lamp.pk).exists()
+            return HttpResponse()
+
+        for _ in range(10):
+            Order.objects.create()
+        with self.assertLogs("store.middleware", "WARNING") as logs:
+            ServerTimingMiddleware(view)(RequestFactory().get("/"))
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("ran the same query 3 times", logs.output[0])
+        self.assertIn("10 times with different parameters", logs.output[1])
+
+
+class DatabaseRoutingTests(TestCase):
+    router = PrimaryReplicaRouter()
+
+    def route(self, state, model=Product):
+        token = _state.set(state)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            _state.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=["replica_1"])
+    def test_catalog_reads_use_replica_until_a_write(self):
+        state = RoutingState()
+        self.assertEqual(self.route(state), "replica_1")
+        self.assertEqual(self.route(state, DailySales), "replica_1")
+        self.assertEqual(self.route(state, Order), "default")
+
+        token = _state.set(state)
+        self.router.db_for_write(Session)
+        self.assertFalse(state.wrote)
+        self.router.db_for_write(OrderItem)
+        _state.reset(token)
+        self.assertEqual(self.route(state), "default")
+
+    @override_settings(DATABASE_REPLICAS=["replica_1"])
+    def test_pinned_requests_and_background_jobs_read_primary(self):
+        self.assertEqual(self.route(RoutingState(pinned=True)), "default")
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_writes_set_the_sticky_cookie(self):
+        user = User.objects.create_user("shopper", password="secret")
+        product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        self.assertNotIn("db_primary", self.client.get(reverse("home")).cookies)
+
+        self.client.force_login(user)
+        response = self.client.post(reverse("add_to_cart", args=[product.id]))
+        self.assertEqual(response.cookies["db_primary"]["max-age"], settings.DATABASE_STICKY_SECONDS)
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser("admin", password="secret")
+        cls.category = Category.objects.create(name="Lighting")
+        cls.lamp = Product.objects.create(name="Desk Lamp", price=Decimal("10.00"), stock=3, category=cls.category)
+        cls.chair = Product.objects.create(name="Chair", price=Decimal("50.00"), stock=1)
+        cls.order = Order.objects.create(user=cls.staff, paid=True)
+        OrderItem.objects.create(order=cls.order, product=cls.lamp, price=Decimal("10.00"), quantity=2)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def test_every_store_model_has_a_changelist(self):
+        for model in (Category, Checkpoint, CoPurchase, DailySales, Order, OrderItem, Product, ProductImage,
+                      RelatedProduct):
+            url = reverse(f"admin:store_{model._meta.model_name}_changelist")
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_product_changelist_shows_placeholders_not_originals(self):
+        response = self.client.get(reverse("admin:store_product_changelist"))
+        self.assertContains(response, 'src="data:image/svg+xml,')
+        self.assertContains(response, 'width="60" height="60"')
+
+    def test_searches(self):
+        response = self.client.get(reverse("admin:store_product_changelist"), {"q": "lamp"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.lamp])
+        for term in (str(self.order.pk), f"#{self.order.pk}", "admin"):
+            response = self.client.get(reverse("admin:store_order_changelist"), {"q": term})
+            self.assertEqual(list(response.context["cl"].result_list), [self.order], term)
+        response = self.client.get(reverse("admin:store_orderitem_changelist"), {"q": "not-a-number"})
+        self.assertEqual(list(response.context["cl"].result_list), [])
+
+    def test_bulk_actions_are_single_updates(self):
+        url = reverse("admin:store_product_changelist")
+        with CaptureQueriesContext(connections["default"]) as queries:
+            self.client.post(url, {"action": "change_price_by_percent", "amount": "10", "select_across": "1",
+                                   "index": "0", "_selected_action": [self.lamp.pk]})
+        # No product rows loaded, one UPDATE (the rest is the changelist's session/user/count queries)
+        writes = [q["sql"][:6] for q in queries if q["sql"].startswith(("UPDATE", 'SELECT "store_product"."id"'))]
+        self.assertEqual(writes, ["UPDATE"])
+        self.assertEqual(
+            list(Product.objects.order_by("pk").values_list("price", flat=True)), [Decimal("11.00"), Decimal("55.00")]
+        )
+
+        self.client.post(url, {"action": "add_stock", "amount": "-2", "index": "0",
+                                "_selected_action": [self.lamp.pk, self.chair.pk]})
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [1, 0])
+
+        response = self.client.post(url, {"action": "set_price", "index": "0", "_selected_action": [self.lamp.pk]},
+                                    follow=True)
+        self.assertContains(response, "Enter an amount")
+        self.assertEqual(Product.objects.get(pk=self.lamp.pk).price, Decimal("11.00"))
+
+    def test_editing_lines_refreshes_order_totals(self):
+        item = self.order.items.get()
+        url = reverse("admin:store_order_change", args=[self.order.pk])
+        self.client.post(url, {
+            "user": self.staff.pk, "paid": "on", "shipping_address": "",
+            "items-TOTAL_FORMS": "1", "items-INITIAL_FORMS": "1", "items-MIN_NUM_FORMS": "0",
+            "items-MAX_NUM_FORMS": "1000", "items-0-id": item.pk, "items-0-order": self.order.pk,
+            "items-0-product": self.lamp.pk, "items-0-quantity": "3", "items-0-price": "10.00",
+        })
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.total_amount, self.order.item_count), (Decimal("30.00"), 3))
+
+
+class StaticPipelineTests(TestCase):
+    def test_purge_css_drops_rules_for_unused_classes(self):
+        css = (
+            "/*! license */ .btn{color:red} .carousel, .card{margin: 0} "
+            "@media (min-width: 576px){.carousel{x:1}} @media print{.btn{y:2}} a:not(.carousel){z:3}"
+        )
+        purged = purge_css(css, {"btn", "card"})
+        self.assertEqual(purged, "/*! license */.btn{color:red}.card{margin:0}@media print{.btn{y:2}}a:not(.carousel){z:3}")
+
+    def test_collectstatic_writes_hashed_compressed_assets_served_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command("collectstatic", "--noinput", verbosity=0)
+            manifest = json.loads((Path(root) / "staticfiles.json").read_text())["paths"]
+            hashed = manifest["css/bootstrap.min.css"]
+            self.assertRegex(hashed, r"^css/bootstrap\.min\.[0-9a-f]{12}\.css$")
+
+            content = (Path(root) / hashed).read_bytes()
+            self.assertLess(len(content), (settings.BASE_DIR / "static/css/bootstrap.min.css").stat().st_size / 2)
+            self.assertIn(b".navbar{", content)
+            self.assertEqual(gzip.decompress((Path(root) / f"{hashed}.gz").read_bytes()), content)
+
+            _hashed_names.cache_clear()
+            self.addCleanup(_hashed_names.cache_clear)
+            self.assertContains(self.client.get(reverse("home")), f"/static/{hashed}")
+            response = self.client.get(f"/static/{hashed}", headers={"accept-encoding": "gzip, deflate"})
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(response["Content-Type"], "text/css")
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+            self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), content)
+
+            response = self.client.get("/static/css/bootstrap.min.css", headers={"accept-encoding": "identity"})
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response["Cache-Control"], "public, max-age=300")
+            self.assertEqual(self.client.get("/static/../manage.py").status_code, 404)
+
+
+class WarmupTests(TestCase):
+    def test_warmup_runs_every_step(self):
+        Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        report = {step: result for step, _, result in warmup()}
+        self.assertEqual(list(report), ["templates", "urls", "caches", "pages", "databases"])
+        self.assertGreater(report["templates"], 10)
+        self.assertGreater(report["urls"], 10)
+        self.assertEqual(report["pages"], {"home": 200, "product_list": 200, "cart": 200})
+        # The home page's catalog fragments are cached, so a visitor's first request is served from them
+        with self.assertNumQueries(0):
+            self.client.get(reverse("home"))
+
+    def test_command_reports_import_times(self):
+        out = StringIO()
+        call_command("warmup", "--imports=5", stdout=out)
+        output = out.getvalue()
+        self.assertIn("Warm-up complete.", output)
+        self.assertRegex(output, r"Imports: \d+ modules")
+        self.assertIn("django", output)
+
+
+@skipUnless(connection.vendor == "postgresql", "needs row locks (PostgreSQL)")
+class CheckoutLockTests(TransactionTestCase):
+    def test_cart_action_waits_for_checkout_then_changes_nothing(self):
+        user = User.objects.create_user("shopper", password="secret")
+        product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        add_to_user_cart(user, {product.id: 1})
+        order, line = Order.objects.get(), OrderItem.objects.get()
+
+        results = []
+
+        def increase():
+            results.append(change_cart_line(user, line.id, "increase"))
+            connections.close_all()
+
+        # Hold the cart's lock the way checkout does while the action runs
+        with transaction.atomic():
+            Order.objects.select_for_update().get(pk=order.pk)
+            worker = threading.Thread(target=increase)
+            worker.start()
+            worker.join(0.5)
+            self.assertTrue(worker.is_alive())
+            Order.objects.filter(pk=order.pk).update(paid=True)
+        worker.join()
+
+        self.assertEqual(results, [False])
+        self.assertEqual(OrderItem.objects.get().quantity, 1)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "set DB_REPLICAS, e.g. DB_ENGINE=sqlite3 DB_REPLICAS=db-replica.sqlite3")
+class ReadReplicaTests(TransactionTestCase):
+    """
+    Runs against the configured replicas (test mirrors of default), e.g.
+    DB_ENGINE=sqlite3 DB_REPLICAS=db-replica.sqlite3 python manage.py test store.tests.ReadReplicaTests
+    """
+
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def replica_queries(self, *args, **kwargs):
+        contexts = [CaptureQueriesContext(connections[alias]) for alias in settings.DATABASE_REPLICAS]
+        for context in contexts:
+            context.__enter__()
+        response = self.client.get(*args, **kwargs)
+        for context in contexts:
+            context.__exit__(None, None, None)
+        self.assertEqual(response.status_code, 200)
+        return sum(len(context) for context in contexts)
+
+    def test_home_reads_replica_except_right_after_a_write(self):
+        user = User.objects.create_user("shopper", password="secret")
+        product = Product.objects.create(name="Lamp", price=Decimal("10.00"))
+        self.assertGreater(self.replica_queries(reverse("home")), 0)
+
+        self.client.force_login(user)
+        self.client.post(reverse("add_to_cart", args=[product.id]))
+        self.assertEqual(self.replica_queries(reverse("home"), {"q": "lamp"}), 0)
@@ -3,11 +3,13 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('products.json', views.product_list, name='product_list'),
     path('cart/', views.cart_view, name='cart'),
     path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('checkout/', views.checkout, name='checkout'),
     path('order-success/', views.order_success, name='order_success'),
     path("dashboard/", views.dashboard, name="dashboard"),
+    path("dashboard/export/", views.export_orders, name="export_orders"),
     path("cart/remove/<int:item_id>/", views.remove_from_cart, name="remove_from_cart"),
     path("cart/update/<int:item_id>/", views.update_cart, name="update_cart"),
     path('manage-orders/', views.manage_orders, name='manage_orders'),
@@ -1,29 +1,85 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.db import transaction
+from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 from datetime import timedelta
-from .models import Product, Order, OrderItem
+from decimal import Decimal, InvalidOperation
+from .cart import (
+    MAX_LINE_QUANTITY, aadd_to_user_cart, achange_cart_line, aget_cart_count, ainvalidate_cart_count,
+    aload_session_cart, aset_cart_count, aupdate_session_cart, invalidate_cart_count,
+)
+from .catalog import acached_fragment
+from .conditional import aconditional
+from .context_processors import aprepare_context
+from .exports import stream_csv, stream_ndjson
+from .facets import aproduct_facets
+from .inventory import OutOfStock, decrement_stock, stock_shortages
+from .models import Category, Product, Order, OrderItem
+from .pagination import akeyset_page, keyset_page
+from .recommendations import arelated_products
+from .reports import asales_summary, record_paid_order
+from .routers import read_replica
+from .search import match_products, search_products
 
 
 # ------------------------------
 # HOME / PRODUCT LISTING
 # ------------------------------
-def home(request):
-    products = Product.objects.all()
+PRODUCTS_PER_PAGE = 24
 
-    # Distinct category list (id, name)
-    categories = Product.objects.values_list("category__id", "category__name").distinct()
+# Rendered card width for each grid breakpoint, so the browser picks the right derivative
+CARD_IMAGE_SIZES = "(min-width: 992px) 20vw, (min-width: 768px) 25vw, (min-width: 576px) 50vw, 100vw"
 
-    # Get filters from query params
-    query = request.GET.get("q", "")
-    selected_categories = [c for c in request.GET.getlist("category") if c]  # ignore empty "None"
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
+# Stands in for the CSRF token in cached grid HTML
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+# Keyset orderings; each ends in "id" so every row has a unique position
+PRODUCT_SORTS = {
+    "newest": ("-created_at", "-id"),
+    "price_asc": ("price", "id"),
+    "price_desc": ("-price", "-id"),
+}
+
+
+def _clean_price(value):
+    try:
+        price = Decimal(value.strip()) if value else None
+    except InvalidOperation:
+        return ""
+    return str(price) if price is not None and price.is_finite() else ""
+
+
+def _filtered_products(request):
+    """
+    Apply the storefront filters from the query string; shared by home and product_list.
+    Filters are normalized, so equivalent URLs share one `filter_params` (and cache key).
+    """
+    products = Product.objects.all()
 
-    # Apply search filter
+    # Get filters from query params
+    query = " ".join(request.GET.get("q", "").split())
+    # ignore empty "None" and non-numeric ids
+    selected_categories = sorted({c for c in request.GET.getlist("category") if c.isdigit()}, key=int)
+    min_price = _clean_price(request.GET.get("min_price"))
+    max_price = _clean_price(request.GET.get("max_price"))
+    sort = request.GET.get("sort", "")
+    if sort not in PRODUCT_SORTS:
+        sort = ""
+
+    # Apply search filter (full-text + trigram on PostgreSQL, ordered by relevance)
     if query:
-        products = products.filter(Q(name__icontains=query) | Q(description__icontains=query))
+        products = search_products(products, query)
 
     # Apply category filter
     if selected_categories:
@@ -35,72 +91,269 @@ def home(request):
     if max_price:
         products = products.filter(price__lte=max_price)
 
-    context = {
-        "products": products,
-        "categories": categories,
-        "selected_categories": selected_categories,
+    # Explicit sort wins; otherwise searches keep relevance order
+    if sort or not query:
+        products = products.order_by(*PRODUCT_SORTS[sort or "newest"])
+
+    params = [("q", query)] + [("category", c) for c in selected_categories] + [("sort", sort)]
+    price_params = [("min_price", min_price), ("max_price", max_price)]
+
+    filters = {
         "query": query,
+        "selected_categories": selected_categories,
         "min_price": min_price,
         "max_price": max_price,
+        "sort": sort,
+        # Query string for the "load more" link, without the cursor
+        "filter_params": urlencode([(k, v) for k, v in params + price_params if v]),
+        # Same without the price range, for the price bucket links
+        "price_params": urlencode([(k, v) for k, v in params if v]),
     }
+    return products, filters
+
+
+def _latest(*timestamps):
+    return max(filter(None, timestamps), default=None)
+
+
+async def _catalog_signature(request):
+    """
+    What the home page is built from: product and category counts (deletions)
+    and newest changes, plus the user menu and cart badge.
+    Cached like the fragments, so anonymous revisits stay query-free.
+    """
+    async def catalog_state():
+        products = await Product.objects.aaggregate(count=Count("id"), updated=Max("updated_at"))
+        categories = await Category.objects.aaggregate(count=Count("id"), updated=Max("updated_at"))
+        return products, categories
+
+    products, categories = await acached_fragment("signature", "", catalog_state)
+    user = await request.auser()
+    cart_count = await aget_cart_count(request)
+    if user.is_authenticated or cart_count:
+        # Cart changes don't show in the catalog timestamps, so only the ETag applies
+        return (products, categories, user.pk, cart_count), None
+    return (products, categories), _latest(products["updated"], categories["updated"])
+
+
+# The read-heavy storefront views below are async: under ASGI (see ecommerce/asgi.py)
+# a request waiting on the database or a slow client doesn't hold a worker. Every
+# query runs through the async ORM before rendering, so templates never hit the database.
+@aconditional(_catalog_signature)
+async def home(request):
+    await aprepare_context(request)
+    products, filters = _filtered_products(request)
+    cursor = request.GET.get("cursor", "")
+    context = {"card_sizes": CARD_IMAGE_SIZES, **filters}
+
+    async def render_sidebar():
+        # Facet counts over the search results, each facet ignoring its own selection
+        base = match_products(Product.objects.all(), filters["query"]) if filters["query"] else Product.objects.all()
+        facets = await aproduct_facets(base, filters["selected_categories"], filters["min_price"], filters["max_price"])
+        return render_to_string("store/_sidebar.html", {**facets, **filters})
+
+    async def render_grid():
+        page, next_cursor = await akeyset_page(products, cursor, PRODUCTS_PER_PAGE)
+        context.update(products=page, next_cursor=next_cursor)
+        return render_to_string("store/_product_grid.html", {**context, "csrf_token": CSRF_PLACEHOLDER})
+
+    # Fragments are keyed by catalog version (store.catalog), so catalog edits invalidate them.
+    # The grid is shared by everyone: its add-to-cart forms get this visitor's CSRF token
+    # swapped in after the cache lookup.
+    filter_params = filters["filter_params"]
+    context["sidebar_html"] = mark_safe(await acached_fragment("sidebar", filter_params, render_sidebar))
+    grid_html = await acached_fragment("grid", f"{filter_params}&cursor={cursor}", render_grid)
+    context["grid_html"] = mark_safe(grid_html.replace(CSRF_PLACEHOLDER, get_token(request)))
     return render(request, "store/home.html", context)
 
 
+def product_list(request):
+    """JSON version of the home grid, used to load more cards while scrolling."""
+    products, filters = _filtered_products(request)
+    page, next_cursor = keyset_page(products, request.GET.get("cursor"), PRODUCTS_PER_PAGE)
+
+    results = [
+        {
+            "id": product.id,
+            "name": product.name,
+            "description": Truncator(product.description).chars(120),
+            "price": str(product.price),
+            "image": product.get_or_fetch_image(),
+            "placeholder": product.image_placeholder(),
+            "color": product.image_color(),
+            "srcset": product.image_srcset(),
+            "webp_srcset": product.webp_srcset(),
+            "add_to_cart_url": reverse("add_to_cart", args=[product.id]),
+        }
+        for product in page
+    ]
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
 # ------------------------------
 # CART / ADD TO CART
 # ------------------------------
-@login_required
-def add_to_cart(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-
-    # Get or create active order for the user
-    order, created = Order.objects.get_or_create(user=request.user, paid=False)
-
+def _posted_quantity(request):
+    try:
+        return min(max(1, int(request.POST.get("quantity", 1))), MAX_LINE_QUANTITY)
+    except ValueError:
+        return 1
+
+
+def _wants_json(request):
+    return request.get_preferred_type(["text/html", "application/json"]) == "application/json"
+
+
+async def _cart_changed(request, user, line):
+    """
+    Respond to a cart mutation. Plain form posts are redirected to the cart page;
+    fetch() callers asking for JSON get the changed line (`line` is a Q over the
+    user's cart items), the cart total and the badge count from one aggregate query.
+    """
+    if not _wants_json(request):
+        await ainvalidate_cart_count(request)
+        return redirect("cart")
+
+    line_total = F("price") * F("quantity")
+    money = DecimalField(max_digits=12, decimal_places=2)
+    summary = await OrderItem.objects.filter(order__user=user, order__paid=False).aaggregate(
+        cart_total=Sum(line_total, output_field=money),
+        cart_count=Count("id"),
+        line_quantity=Sum("quantity", filter=line),
+        line_total=Sum(line_total, filter=line, output_field=money),
+    )
+    await aset_cart_count(request, summary["cart_count"])
+    return JsonResponse({
+        "quantity": summary["line_quantity"] or 0,
+        "line_total": f"{summary['line_total'] or 0:.2f}",
+        "cart_total": f"{summary['cart_total'] or 0:.2f}",
+        "cart_count": summary["cart_count"],
+    })
+
+
+async def _session_cart_changed(request, quantities, product_id):
+    """`_cart_changed` for a visitor's session cart; `quantities` is the updated cart."""
+    if quantities is None:
+        raise Http404("No OrderItem matches the given query.")
+    if not _wants_json(request):
+        return redirect("cart")
+
+    prices = Product.objects.filter(pk__in=[int(pk) for pk in quantities]).values_list("pk", "price")
+    totals = {str(pk): price * quantities[str(pk)] async for pk, price in prices}
+    key = str(product_id)
+    return JsonResponse({
+        "quantity": quantities.get(key, 0),
+        "line_total": f"{totals.get(key, 0):.2f}",
+        "cart_total": f"{sum(totals.values()):.2f}",
+        "cart_count": len(quantities),
+    })
+
+
+# Anonymous visitors' carts live in the session, so browsing never creates rows;
+# signing in moves them into an order (store.cart.merge_session_cart)
+async def add_to_cart(request, product_id):
     # Read quantity from POST (default = 1)
-    quantity = int(request.POST.get("quantity", 1))
+    quantity = _posted_quantity(request)
 
-    # Get or create order item
-    order_item, created = OrderItem.objects.get_or_create(
-        order=order,
-        product=product,
-        defaults={'price': product.price, 'quantity': quantity}
-    )
+    user = await request.auser()
+    if not user.is_authenticated:
+        if not await Product.objects.filter(pk=product_id).aexists():
+            raise Http404("No Product matches the given query.")
+        quantities = await aupdate_session_cart(request, product_id, lambda q: q + quantity, create=True)
+        return await _session_cart_changed(request, quantities, product_id)
 
-    if not created:
-        # If item already exists, increase its quantity
-        order_item.quantity += quantity
-        order_item.save()
+    # Get or create the user's active order, then insert the line or bump its
+    # quantity in a single upsert
+    if not await aadd_to_user_cart(user, {product_id: quantity}):
+        raise Http404("No Product matches the given query.")
 
-    return redirect('cart')
+    return await _cart_changed(request, user, Q(product_id=product_id))
 
 
 # ------------------------------
 # VIEW CART
 # ------------------------------
-@login_required
-def cart_view(request):
-    order = Order.objects.filter(user=request.user, paid=False).first()
-    return render(request, "store/cart.html", {"order": order})
+def _cart_queryset(user):
+    return (
+        Order.objects.filter(user=user, paid=False)
+        .annotate(
+            items_total=Sum(
+                F("items__price") * F("items__quantity"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            items_quantity=Sum("items__quantity"),
+        )
+        .prefetch_related(
+            Prefetch("items", queryset=OrderItem.objects.select_related("product").order_by("id"))
+        )
+    )
+
+
+def load_cart(user):
+    """
+    Return the user's active (unpaid) order, or None, in two queries:
+    the order with `items_total`/`items_quantity` summed in the database,
+    and its items with their products.
+    """
+    return _cart_queryset(user).first()
+
+
+async def aload_cart(user):
+    """Async version of `load_cart`."""
+    return await _cart_queryset(user).afirst()
+
+
+async def cart_view(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        order = await aload_cart(user)
+        await aset_cart_count(request, len(order.items.all()) if order else 0)
+    else:
+        order = await aload_session_cart(request)
+    # Precomputed by the build_recommendations command
+    in_cart = [item.product_id for item in order.items.all()] if order else []
+    recommendations = await arelated_products(in_cart) if in_cart else []
+    await aprepare_context(request)
+    return render(request, "store/cart.html", {"order": order, "recommendations": recommendations})
 
 
 # ------------------------------
 # UPDATE CART ITEM QUANTITY
 # ------------------------------
-@login_required
-def update_cart(request, item_id):
-    item = get_object_or_404(OrderItem, id=item_id, order__user=request.user, order__paid=False)
+def _cart_items(user, item_id):
+    return OrderItem.objects.filter(id=item_id, order__user=user, order__paid=False)
+
+
+# For visitors, `item_id` is the product id (see store.cart.SessionCart)
+SESSION_CART_ACTIONS = {
+    "increase": lambda quantity: quantity + 1,
+    "decrease": lambda quantity: quantity - 1,
+}
+
+
+async def update_cart(request, item_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        if request.method != "POST":
+            return redirect("cart")
+        change = SESSION_CART_ACTIONS.get(request.POST.get("action"), lambda quantity: quantity)
+        quantities = await aupdate_session_cart(request, item_id, change)
+        return await _session_cart_changed(request, quantities, item_id)
+
+    items = _cart_items(user, item_id)
 
     if request.method == "POST":
         action = request.POST.get("action")
-        if action == "increase":
-            item.quantity += 1
-            item.save()
-        elif action == "decrease":
-            if item.quantity > 1:
-                item.quantity -= 1
-                item.save()
-            else:
-                item.delete()  # remove item if quantity goes to 0
+        if action in ("increase", "decrease"):
+            # Also refreshes the cart's stored totals (and its updated_at, see manage_orders)
+            changed = await achange_cart_line(user, item_id, action)
+        else:
+            changed = await items.aexists()
+        if not changed:
+            raise Http404("No OrderItem matches the given query.")
+        return await _cart_changed(request, user, Q(id=item_id))
+    elif not await items.aexists():
+        raise Http404("No OrderItem matches the given query.")
 
     return redirect("cart")
 
@@ -108,11 +361,15 @@ def update_cart(request, item_id):
 # ------------------------------
 # REMOVE ITEM FROM CART
 # ------------------------------
-@login_required
-def remove_from_cart(request, item_id):
-    item = get_object_or_404(OrderItem, id=item_id, order__user=request.user, order__paid=False)
-    item.delete()
-    return redirect('cart')
+async def remove_from_cart(request, item_id):
+    user = await request.auser()
+    if not user.is_authenticated:
+        quantities = await aupdate_session_cart(request, item_id, lambda quantity: 0)
+        return await _session_cart_changed(request, quantities, item_id)
+
+    if not await achange_cart_line(user, item_id, "remove"):
+        raise Http404("No OrderItem matches the given query.")
+    return await _cart_changed(request, user, Q(id=item_id))
 
 
 # ------------------------------
@@ -120,18 +377,44 @@ def remove_from_cart(request, item_id):
 # ------------------------------
 @login_required
 def checkout(request):
-    order = Order.objects.filter(user=request.user, paid=False).first()
-    if not order or not order.items.exists():
+    order = load_cart(request.user)
+    if not order or not order.items_quantity:
         return redirect('home')
 
     if request.method == "POST":
         # Integrate payment gateway here if needed
-        order.paid = True
-        order.shipping_address = request.POST.get("shipping_address", "")
-        order.save()
+        try:
+            with transaction.atomic():
+                # Lock the cart so it can't be paid twice; the cart mutations
+                # (store.cart) take the same lock, so its lines can't change mid-checkout
+                locked = Order.objects.select_for_update().filter(pk=order.pk, paid=False).first()
+                if locked is None:
+                    return redirect('order_success')
+                lines = list(locked.items.all())
+                if not decrement_stock(lines):
+                    raise OutOfStock
+                # Freeze the totals as paid, from the lines the stock was taken for
+                locked.total_amount = sum(line.total_price() for line in lines)
+                locked.item_count = sum(line.quantity for line in lines)
+                locked.paid = True
+                locked.paid_at = now()
+                locked.shipping_address = request.POST.get("shipping_address", "")
+                locked.save()
+                # After commit, in its own short transaction: every checkout updates
+                # the day's totals row, and holding that row's lock until this one
+                # commits would queue all concurrent checkouts behind each other.
+                # robust: a failure is logged, and the next rollup_sales rebuilds the day
+                transaction.on_commit(lambda: record_paid_order(locked), robust=True)
+        except OutOfStock:
+            shortages = stock_shortages(order.items.all(), refresh=True)
+            context = {"order": order, "shortages": shortages}
+            return render(request, "store/checkout.html", context, status=409)
+        invalidate_cart_count(request)
         return redirect('order_success')
 
-    return render(request, "store/checkout.html", {"order": order})
+    # Early warning from the already-loaded products; checkout re-checks atomically
+    shortages = stock_shortages(order.items.all())
+    return render(request, "store/checkout.html", {"order": order, "shortages": shortages})
 
 
 # ------------------------------
@@ -145,16 +428,18 @@ def order_success(request):
 # ------------------------------
 # DASHBOARD
 # ------------------------------
-@login_required
-def dashboard(request):
-    # Filters
+ORDERS_PER_PAGE = 50
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _filtered_orders(request):
+    """Apply the dashboard filters from the query string; shared by dashboard and export_orders."""
     status = request.GET.get("status")  # paid/unpaid
     category = request.GET.get("category")
     days = request.GET.get("days")
 
-    # Base Query
-    orders = Order.objects.all()
-    products = Product.objects.all()
+    # Reporting reads tolerate replica lag (store.routers)
+    orders = Order.objects.using(read_replica())
 
     # Filter by order status
     if status == "paid":
@@ -162,39 +447,139 @@ def dashboard(request):
     elif status == "unpaid":
         orders = orders.filter(paid=False)
 
-    # Filter products by category
+    # Filter orders by recent days
+    try:
+        days = int(days) if days else None
+    except ValueError:
+        days = None
+    if days is not None:
+        orders = orders.filter(created_at__gte=now() - timedelta(days=days))
+
+    filters = {"status": status, "category": category, "days": days}
+    return orders.order_by("-created_at", "-id"), filters
+
+
+@login_required
+async def dashboard(request):
+    await aprepare_context(request)
+    orders, filters = _filtered_orders(request)
+    status, category, days = filters["status"], filters["category"], filters["days"]
+
+    products = Product.objects.all()
     if category:
         products = products.filter(category__name=category)
 
-    # Filter orders by recent days
-    if days:
-        try:
-            days = int(days)
-            start_date = now() - timedelta(days=days)
-            orders = orders.filter(created_at__gte=start_date)
-        except ValueError:
-            pass
+    # Dashboard summary: paid figures come from the daily rollup (store.reports);
+    # only open carts are counted live
+    sales = await asales_summary(category=category, days=days)
+    unpaid_orders = Order.objects.using(orders.db).filter(paid=False)
+    if days is not None:
+        unpaid_orders = unpaid_orders.filter(created_at__gte=now() - timedelta(days=days))
+    if category:
+        unpaid_orders = unpaid_orders.filter(items__product__category__name=category).distinct()
+
+    if status == "unpaid":
+        total_sales = 0
+        total_orders = await unpaid_orders.acount()
+    elif status == "paid":
+        total_sales = sales["revenue"]
+        total_orders = sales["orders"]
+    else:
+        total_sales = sales["revenue"]
+        total_orders = sales["orders"] + await unpaid_orders.acount()
+    total_products = await products.acount()
+
+    # One query for the page: username via join, line count via a per-row subquery
+    line_counts = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(n=Count("*"))
+        .values("n")
+    )
+    orders = orders.select_related("user").annotate(lines=Coalesce(Subquery(line_counts), 0))
+    page, next_cursor = await akeyset_page(orders, request.GET.get("cursor"), ORDERS_PER_PAGE)
 
-    # Dashboard summary
-    total_sales = orders.filter(paid=True).aggregate(total=Sum("items__price"))["total"] or 0
-    total_orders = orders.count()
-    total_products = products.count()
+    params = request.GET.copy()
+    params.pop("cursor", None)
 
     context = {
-        "orders": orders,
-        "products": products,
+        "orders": page,
+        "next_cursor": next_cursor,
+        "filter_params": params.urlencode(),
+        "categories": [name async for name in Category.objects.order_by("name").values_list("name", flat=True)],
         "total_sales": total_sales,
         "total_orders": total_orders,
         "total_products": total_products,
     }
     return render(request, "store/dashboard.html", context)
 
+
+async def _arows(queryset, fields):
+    # values(), not values_list(): the latter's aiterator() runs its query synchronously
+    async for row in queryset.values(*fields).aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield tuple(row[field] for field in fields)
+
+
+@staff_member_required
+def export_orders(request):
+    """Stream the filtered dashboard orders as CSV (default) or NDJSON (?format=ndjson)."""
+    orders, _ = _filtered_orders(request)
+    header = ("id", "user", "paid", "created_at", "paid_at", "lines", "units", "total")
+    fields = ("id", "user__username", "paid", "created_at", "paid_at", "lines", "units", "total")
+    rows = (
+        orders.annotate(
+            lines=Count("items"),
+            units=Coalesce(Sum("items__quantity"), 0),
+            total=Coalesce(
+                Sum(F("items__price") * F("items__quantity"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Value(Decimal("0")),
+            ),
+        )
+    )
+    # Server-side cursor on PostgreSQL: rows are fetched in chunks, never all at once.
+    # Under ASGI the response must be fed by an async iterator to really stream.
+    if isinstance(request, ASGIRequest):
+        rows = _arows(rows, fields)
+    else:
+        rows = rows.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if request.GET.get("format") == "ndjson":
+        return stream_ndjson(rows, header, "orders")
+    return stream_csv(rows, header, "orders")
+
+
+MY_ORDERS_PER_PAGE = 20
+
+
+async def _orders_signature(request):
+    """What manage_orders is built from: the user's orders and lines, counted and newest change."""
+    user = await request.auser()
+    state = await Order.objects.filter(user=user).aaggregate(
+        orders=Count("id", distinct=True),
+        orders_updated=Max("updated_at"),
+        lines=Count("items"),
+        lines_updated=Max("items__updated_at"),
+    )
+    return (user.pk, state), _latest(state["orders_updated"], state["lines_updated"])
+
+
 @login_required
-def manage_orders(request):
-    # Get orders for the logged-in user
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+@aconditional(_orders_signature)
+async def manage_orders(request):
+    await aprepare_context(request)
+    # One page of the user's orders: totals are stored on the order, the lines
+    # and their products come in one prefetch with the subtotal computed in SQL
+    lines = OrderItem.objects.select_related("product").annotate(line_total=F("price") * F("quantity")).order_by("id")
+    orders = (
+        Order.objects.filter(user=request.user)
+        .order_by("-created_at", "-id")
+        .prefetch_related(Prefetch("items", queryset=lines))
+    )
+    page, next_cursor = await akeyset_page(orders, request.GET.get("cursor"), MY_ORDERS_PER_PAGE)
 
     context = {
-        "orders": orders,
+        "orders": page,
+        "next_cursor": next_cursor,
     }
     return render(request, "store/manage_orders.html", context)
\ No newline at end of file
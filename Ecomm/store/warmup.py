@@ -0,0 +1,158 @@
+# store/warmup.py
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import NoReverseMatch, Resolver404, get_resolver, resolve, reverse
+
+from .catalog import catalog_version
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = {".html", ".txt", ".xml"}
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def warm_templates():
+    """Compile every template into the cached loader; returns how many loaded."""
+    loaded = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.template_dirs:
+            root = Path(directory)
+            for path in root.rglob("*"):
+                if path.suffix not in TEMPLATE_SUFFIXES or not path.is_file():
+                    continue
+                try:
+                    engine.get_template(path.relative_to(root).as_posix())
+                except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+                    logger.warning("Warm-up could not compile %s: %s", path, exc)
+                else:
+                    loaded += 1
+    return loaded
+
+
+def _url_names(resolver, namespace=""):
+    """(name, kwargs) for every named pattern, namespaces included, with placeholder arguments."""
+    for key, entries in resolver.reverse_dict.lists():
+        if isinstance(key, str):
+            for possibilities, *_ in entries:
+                for _, params in possibilities:
+                    yield namespace + key, {param: "1" for param in params}
+    for prefix, (_, child) in resolver.namespace_dict.items():
+        yield from _url_names(child, f"{namespace}{prefix}:")
+
+
+def warm_urls():
+    """Build the URL resolvers and reverse and resolve every named URL; returns how many resolved."""
+    resolved = 0
+    for name, kwargs in _url_names(get_resolver()):
+        try:
+            resolve(reverse(name, kwargs=kwargs))
+        except (NoReverseMatch, Resolver404):
+            # Arguments a placeholder can't satisfy, e.g. admin's app_label choices
+            continue
+        resolved += 1
+    return resolved
+
+
+def warm_caches():
+    """Connect every cache backend and seed the catalog version the fragment keys hang off."""
+    for alias in settings.CACHES:
+        caches[alias].get("warmup")
+    catalog_version()
+    return list(settings.CACHES)
+
+
+def warm_pages(names):
+    """
+    Request the pages named in `names` once, as an anonymous visitor, through a
+    real request handler: runs the middleware, the views and the context
+    processors, and fills the catalog fragment cache. Returns {name: status}.
+    """
+    hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host not in ("*", ".")]
+    host = hosts[0] if hosts else "localhost"
+    handler = WSGIHandler()
+    statuses = {}
+    for name in names:
+        environ = {
+            "REQUEST_METHOD": "GET", "PATH_INFO": reverse(name), "SCRIPT_NAME": "", "QUERY_STRING": "",
+            "SERVER_NAME": host, "SERVER_PORT": "80", "HTTP_HOST": host,
+            "wsgi.input": BytesIO(), "wsgi.errors": sys.stderr, "wsgi.url_scheme": "http",
+        }
+        response = handler(environ, lambda status, headers, exc_info=None: None)
+        response.close()
+        statuses[name] = response.status_code
+    return statuses
+
+
+def warm_databases():
+    """Check every configured database answers a query, filling its pool if it has one."""
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+    return list(connections)
+
+
+def warmup(pages=None):
+    """
+    Run every warm-up step in this process and return [(step, seconds, result)].
+    Meant for the WSGI/ASGI entry points (WARMUP=1) and the `warmup` command.
+    Closes this thread's database connections when done (pooled ones go back
+    to the pool), so none are inherited by forked workers.
+    """
+    if pages is None:
+        pages = getattr(settings, "WARMUP_URLS", [])
+    steps = [
+        ("templates", warm_templates),
+        ("urls", warm_urls),
+        ("caches", warm_caches),
+        ("pages", lambda: warm_pages(pages)),
+        # Last: with CONN_MAX_AGE=0 the page requests close their connections when they finish
+        ("databases", warm_databases),
+    ]
+    report = []
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception as exc:
+            # A cold worker is still better than one that doesn't start
+            logger.warning("Warm-up step %s failed: %s", name, exc)
+            result = f"failed: {exc}"
+        report.append((name, time.perf_counter() - started, result))
+    connections.close_all()
+    return report
+
+
+def import_times(modules):
+    """
+    Set Django up and import `modules` in a fresh interpreter with -X importtime.
+    Returns [(module, self_us, cumulative_us, depth)] in import order.
+    """
+    code = "import django; django.setup(); " + "; ".join(f"import {module}" for module in modules)
+    # Don't let the child run the entry points' own warm-up
+    env = {key: value for key, value in os.environ.items() if key != "WARMUP"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, check=True,
+    )
+    times = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            times.append((module, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return times